@@ -0,0 +1,360 @@
+import numpy as np
+from settings import BLOCKS
+from Block import ROTATIONS, WIDTHS
+from PieceGenerator import GENERATORS
+
+# Every rotation of every shape in a SIZExSIZE matrix (padded with empty cells)
+_SIZE = max(max(len(shape), len(shape[0])) for shape in BLOCKS)
+_SHAPES = np.zeros((len(BLOCKS), 4, _SIZE, _SIZE), dtype=bool)
+_WIDTHS = np.zeros((len(BLOCKS), 4), dtype=np.int64)
+_HEIGHTS = np.zeros((len(BLOCKS), 4), dtype=np.int64)
+for _piece, _rotations in enumerate(ROTATIONS):
+    for _rotation, _rotated in enumerate(_rotations):
+        _HEIGHTS[_piece, _rotation], _WIDTHS[_piece, _rotation] = len(_rotated), WIDTHS[_piece][_rotation]
+        for _y, _mask in enumerate(_rotated):
+            for _x in range(WIDTHS[_piece][_rotation]):
+                _SHAPES[_piece, _rotation, _y, _x] = bool((_mask >> _x) & 1)
+
+
+class BatchTetris:
+    def __init__(self, width, height, seeds, generator="uniform"):
+        """
+            Initializes a batch of games that are updated all together.
+            Each game behaves as a Tetris game with the same seed.
+
+            The locked cells of the games are stored in the (games, height, width) array boards,
+            where each cell contains the index+1 of its color in COLORS (0 for the empty cells).
+            The current block of each game is not in boards (see getBoards).
+
+            Parameters
+            ----------
+            width, height : int
+                Size of the grids
+
+            seeds : list of int
+                Seed of each game
+
+            generator : str, optional
+                The piece generator of the games, one of the keys of PieceGenerator.GENERATORS
+        """
+        self.width = width
+        self.height = height
+        self.size = len(seeds)
+
+        self.boards = np.zeros((self.size, height, width), dtype=np.uint8)
+        # Identifies the block that owns each cell (0 for the empty cells), needed to let the blocks fall as a whole
+        self._labels = np.zeros((self.size, height, width), dtype=np.int64)
+        self._next_label = 1
+
+        # Current block of each game
+        self._active = np.zeros(self.size, dtype=bool)
+        self._piece = np.zeros(self.size, dtype=np.int64)
+        self._rotation = np.zeros(self.size, dtype=np.int64)
+        self._color = np.zeros(self.size, dtype=np.int64)
+        self._x = np.zeros(self.size, dtype=np.int64)
+        self._y = np.zeros(self.size, dtype=np.int64)
+
+        self._generators = [GENERATORS[generator](seed) for seed in seeds]
+        self.next_piece = np.zeros(self.size, dtype=np.int64)
+        self.next_color = np.zeros(self.size, dtype=np.int64)
+        for i in range(self.size):
+            self._generateBlock(i)
+
+        self.score = np.zeros(self.size, dtype=np.int64)
+        self.done = np.zeros(self.size, dtype=bool)
+
+    def _generateBlock(self, i):
+        """
+            Generates the next block of a game.
+
+            Parameters
+            ----------
+            i : int
+                Index of the game
+        """
+        self.next_piece[i], self.next_color[i] = self._generators[i].next()
+
+    def _selected(self, mask):
+        """
+            Returns the indexes of the games with a current block, restricted to the selected ones.
+
+            Parameters
+            ----------
+            mask : array of bool, optional
+                The selected games, all of them if None
+
+            Returns
+            -------
+            array of int
+                The indexes of the games
+        """
+        playing = self._active & ~self.done
+        if mask is not None:
+            playing = playing & mask
+        return np.flatnonzero(playing)
+
+    def _fits(self, games, rotation, x, y):
+        """
+            Tells if the current block of some games fits in the grid with a given position and rotation.
+
+            Parameters
+            ----------
+            games : array of int
+                Indexes of the games
+
+            rotation, x, y : array of int
+                Rotation and position to check for each game
+
+            Returns
+            -------
+            array of bool
+                True for the games where the block is inside the grid and does not overlap other blocks
+        """
+        pieces = self._piece[games]
+        inside = (x >= 0) & (y >= 0) & (x + _WIDTHS[pieces, rotation] <= self.width) & (y + _HEIGHTS[pieces, rotation] <= self.height)
+
+        offsets = np.arange(_SIZE)
+        rows = np.clip(y[:, None, None] + offsets[None, :, None], 0, self.height-1)
+        cols = np.clip(x[:, None, None] + offsets[None, None, :], 0, self.width-1)
+        occupied = self._labels[games[:, None, None], rows, cols] != 0
+
+        return inside & ~(occupied & _SHAPES[pieces, rotation]).any(axis=(1, 2))
+
+    def _moveX(self, direction, mask):
+        """
+            Moves the current block to a specified direction along the x-axis (where possible).
+
+            Parameters
+            ----------
+            direction : int
+                The direction of the move
+
+            mask : array of bool, optional
+                The games where the move is applied, all of them if None
+        """
+        games = self._selected(mask)
+        new_x = self._x[games] + direction
+        can_move = self._fits(games, self._rotation[games], new_x, self._y[games])
+        self._x[games[can_move]] = new_x[can_move]
+
+    def moveLeft(self, mask=None):
+        """
+            Moves the current block to left.
+
+            Parameters
+            ----------
+            mask : array of bool, optional
+                The games where the move is applied, all of them if None
+        """
+        self._moveX(-1, mask)
+
+    def moveRight(self, mask=None):
+        """
+            Moves the current block to right.
+
+            Parameters
+            ----------
+            mask : array of bool, optional
+                The games where the move is applied, all of them if None
+        """
+        self._moveX(1, mask)
+
+    def moveDown(self, mask=None):
+        """
+            Moves the current block at the bottom.
+
+            Parameters
+            ----------
+            mask : array of bool, optional
+                The games where the move is applied, all of them if None
+        """
+        games = self._selected(mask)
+        while games.size > 0:
+            can_fall = self._fits(games, self._rotation[games], self._x[games], self._y[games] + 1)
+            games = games[can_fall]
+            self._y[games] = self._y[games] + 1
+
+    def rotate(self, clockwise, mask=None):
+        """
+            Rotates the current block.
+
+            Parameters
+            ----------
+            clockwise : bool
+                If True, performs a clockwise rotation, couterclockwise otherwise
+
+            mask : array of bool, optional
+                The games where the rotation is applied, all of them if None
+        """
+        games = self._selected(mask)
+        new_rotation = (self._rotation[games] + (1 if clockwise else -1)) % 4
+        can_rotate = self._fits(games, new_rotation, self._x[games], self._y[games])
+        self._rotation[games[can_rotate]] = new_rotation[can_rotate]
+
+    def _blockCells(self, games):
+        """
+            Returns the cells of the grids covered by the current block of some games.
+
+            Parameters
+            ----------
+            games : array of int
+                Indexes of the games
+
+            Returns
+            -------
+            index, rows, cols : array of int
+                For each cell, the position in games of its game and its coordinates
+        """
+        index, rows, cols = np.nonzero(_SHAPES[self._piece[games], self._rotation[games]])
+        return index, rows + self._y[games][index], cols + self._x[games][index]
+
+    def getBoards(self):
+        """
+            Returns the boards with the current blocks.
+
+            Returns
+            -------
+            array of uint8
+                (games, height, width) array with the index+1 of the color of each cell (0 for the empty cells)
+        """
+        boards = self.boards.copy()
+        games = np.flatnonzero(self._active)
+        index, rows, cols = self._blockCells(games)
+        boards[games[index], rows, cols] = self._color[games][index] + 1
+        return boards
+
+    def _lockBlocks(self, games):
+        """
+            Inserts the current block of some games in their boards.
+
+            Parameters
+            ----------
+            games : array of int
+                Indexes of the games
+        """
+        index, rows, cols = self._blockCells(games)
+        labels = np.arange(self._next_label, self._next_label + games.size)
+        self._next_label = self._next_label + games.size
+
+        self._labels[games[index], rows, cols] = labels[index]
+        self.boards[games[index], rows, cols] = self._color[games][index] + 1
+        self._active[games] = False
+
+    def _resetRows(self, games, full):
+        """
+            Resets the full rows of some games and splits the blocks crossing them.
+
+            Parameters
+            ----------
+            games : array of int
+                Indexes of the games
+
+            full : array of bool
+                (games, height) array with the rows to reset
+        """
+        labels = self._labels[games]
+        labels[np.broadcast_to(full[:, :, None], labels.shape)] = 0
+
+        # Parts of the same block separated by a reset row get a different label,
+        # labels are then renumbered to keep them small
+        part = np.cumsum(full, axis=1)[:, :, None]
+        keys = (labels * (self.height + 1) + part)[labels != 0]
+        parts, new_labels = np.unique(keys, return_inverse=True)
+        labels[labels != 0] = new_labels.reshape(-1) + self._next_label
+        self._next_label = self._next_label + parts.size
+
+        self._labels[games] = labels
+        self.boards[games] = np.where(labels != 0, self.boards[games], 0)
+
+    def _handleGravity(self, games):
+        """
+            Handles the gravity of the entire board of some games.
+            Blocks are visited in the same order as Tetris._handleGravity, so the results are the same.
+
+            Parameters
+            ----------
+            games : array of int
+                Indexes of the games
+        """
+        rows = np.arange(self.height)[None, :, None]
+
+        for y in range(self.height-2, -1, -1):
+            for x in range(self.width):
+                labels = self._labels[games, y, x]
+                selected = games[labels != 0]
+                if selected.size == 0:
+                    continue
+                labels = labels[labels != 0]
+
+                grids = self._labels[selected]
+                block = grids == labels[:, None, None]
+                others = (grids != 0) & ~block
+
+                # For each column, the distance between the lowest cell of the block and the first obstacle below it
+                lowest = np.where(block, rows, -1).max(axis=1)
+                obstacle = np.where(others & (rows > lowest[:, None, :]), rows, self.height).min(axis=1)
+                distance = np.where(lowest >= 0, obstacle - lowest - 1, self.height).min(axis=1)
+
+                falling = distance > 0
+                if not falling.any():
+                    continue
+                index, block_rows, block_cols = np.nonzero(block[falling])
+                falling_games = selected[falling][index]
+                colors = self.boards[falling_games, block_rows, block_cols]
+
+                self._labels[falling_games, block_rows, block_cols] = 0
+                self.boards[falling_games, block_rows, block_cols] = 0
+                block_rows = block_rows + distance[falling][index]
+                self._labels[falling_games, block_rows, block_cols] = labels[falling][index]
+                self.boards[falling_games, block_rows, block_cols] = colors
+
+    def nextStep(self):
+        """
+            Updates the grids to the next game cycle.
+
+            Returns
+            -------
+            array of bool
+                False : for the games that are over
+                True  : otherwise
+        """
+        playing = np.flatnonzero(~self.done)
+        spawning = playing[~self._active[playing]]
+        falling = playing[self._active[playing]]
+
+        # Sets a new block and generates the next block
+        if spawning.size > 0:
+            self._piece[spawning] = self.next_piece[spawning]
+            self._color[spawning] = self.next_color[spawning]
+            self._rotation[spawning] = 0
+            self._x[spawning] = round(self.width / 2) - 2
+            self._y[spawning] = 0
+            for i in spawning:
+                self._generateBlock(i)
+
+            fits = self._fits(spawning, self._rotation[spawning], self._x[spawning], self._y[spawning])
+            self._active[spawning[fits]] = True
+            self.done[spawning[~fits]] = True  # Game over
+
+        if falling.size > 0:
+            can_fall = self._fits(falling, self._rotation[falling], self._x[falling], self._y[falling] + 1)
+            self._y[falling[can_fall]] = self._y[falling[can_fall]] + 1
+
+            locking = falling[~can_fall]
+            self._lockBlocks(locking)
+
+            # Score update
+            # The loop handles a full row that is created after the fall of other blocks.
+            # Without full rows the blocks are already at rest, so the gravity is not needed
+            while locking.size > 0:
+                full = (self._labels[locking] != 0).all(axis=2)
+                cleared = full.sum(axis=1)
+                locking, full = locking[cleared > 0], full[cleared > 0]
+                if locking.size == 0:
+                    break
+
+                self.score[locking] = self.score[locking] + cleared[cleared > 0]
+                self._resetRows(locking, full)
+                self._handleGravity(locking)
+
+        return ~self.done
@@ -0,0 +1,395 @@
+import math
+import multiprocessing
+import time
+from TranspositionTable import TranspositionTable
+
+# Weights of the features of a position in its evaluation
+WEIGHTS = {
+    "height": -0.510066,     # Sum of the heights of the columns
+    "lines": 0.760666,       # Rows cleared since the start of the search
+    "holes": -0.35663,       # Empty cells under the top of their column
+    "bumpiness": -0.184483,  # Sum of the differences of height between adjacent columns
+}
+
+TABLE_SIZE = 1 << 16
+
+# Pieces known by the player, the current and the next one, that are placed by the search
+KNOWN_PIECES = 2
+
+def getFeatures(tetris):
+    """
+        Computes the features of the grid of a game from the tops of the columns (see Tetris.getStackTops)
+        and from the cells (see Tetris.getCells).
+        The current block is ignored.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game
+
+        Returns
+        -------
+        height, holes, bumpiness : int
+            The features of the grid (see WEIGHTS)
+    """
+    block = tetris.getCurrentBlock()
+    cells = tetris.getCells()
+    filled = len(cells) - cells.tobytes().count(0)
+    tops = tetris.getStackTops(ignore_current=True)
+    if block is not None:
+        filled = filled - sum(bin(mask).count("1") for mask in block.shape)
+
+    heights = [tetris.height - top for top in tops]
+    height = sum(heights)
+    bumpiness = sum(abs(heights[x] - heights[x+1]) for x in range(len(heights)-1))
+
+    # The cells under the tops are either filled or holes
+    return height, height - filled, bumpiness
+
+def evaluate(tetris, weights=WEIGHTS):
+    """
+        Evaluates the grid of a game, without the rows cleared.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game
+
+        weights : dict, optional
+            Weights of the features
+
+        Returns
+        -------
+        float
+            The value of the grid, higher is better
+    """
+    height, holes, bumpiness = getFeatures(tetris)
+    return weights["height"] * height + weights["holes"] * holes + weights["bumpiness"] * bumpiness
+
+def _searchLevel(beam, level, score, deadline, weights, table, placements=None):
+    """
+        Simulates on a clone every placement of the current block of the games of a level of the search (see searchPlacements).
+
+        Parameters
+        ----------
+        beam : list of tuples (float, Tetris, tuple)
+            The games of the level, with their value and their first placement (None for the game searched)
+
+        level : int
+            The level, 0 for the placements of the current block of the game searched
+
+        score : int
+            The score of the game searched
+
+        deadline, weights, table
+            See searchPlacements
+
+        placements : list of tuples (int, int, int), optional
+            The placements to simulate on the game searched, all the placements of the other games are simulated
+
+        Returns
+        -------
+        candidates : dict
+            The games reached, with their value and their first placement, by key (see TranspositionTable.makeKey)
+
+        evaluated : int
+            Number of placements simulated
+
+        completed : bool
+            False if the deadline stopped the level
+    """
+    candidates = {}
+    evaluated = 0
+    for _, game, first in beam:
+        for placement in (placements if first is None else game.enumeratePlacements()):
+            if (evaluated > 0 or level > 0) and time.monotonic() > deadline:
+                return candidates, evaluated, False
+
+            child = game.clone()
+            child.place(*placement)
+            child.nextStep()  # Locks the block, clearing the full rows
+            evaluated = evaluated + 1
+            # Places the next block, the pieces after it are not known by the player
+            if level + 1 < KNOWN_PIECES and not child.nextStep():
+                continue
+
+            key = TranspositionTable.makeKey(child)
+            value = table.get(key)
+            if value is None:
+                value = evaluate(child, weights)
+                table.put(key, value)
+            value = value + weights["lines"] * (child.score - score)
+
+            if key not in candidates or candidates[key][0] < value:
+                candidates[key] = (value, child, first if first is not None else placement)
+
+    return candidates, evaluated, True
+
+def _prune(candidates, beam_width):
+    """
+        Returns the best beam_width games of a level, from the best one (the first one reached among equal values).
+    """
+    return sorted(candidates.values(), key=lambda candidate: candidate[0], reverse=True)[:beam_width]
+
+def searchPlacements(tetris, placements, depth, beam_width, deadline=math.inf, weights=WEIGHTS, table=None):
+    """
+        Searches the best placement of the current block with a beam search.
+        At each level, every placement of the current block of the games in the beam is simulated on a clone and evaluated,
+        then the best beam_width games are kept. The positions reached more than once are kept once,
+        and their values are cached in the table.
+        Only the current and the next block are known, as for a player, so the search has at most 2 levels.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game, with a current block
+
+        placements : list of tuples (int, int, int)
+            The placements of the current block to search (see Tetris.enumeratePlacements)
+
+        depth : int
+            Number of blocks placed, the levels beyond KNOWN_PIECES are not searched
+
+        beam_width : int
+            Games kept at each level
+
+        deadline : float, optional
+            Time (see time.monotonic) after which the search stops, after at least one placement.
+            If the first level is not completed, the best of the placements simulated so far is chosen,
+            the following levels that are not completed are ignored
+
+        weights : dict, optional
+            Weights of the features (see WEIGHTS)
+
+        table : TranspositionTable, optional
+            Cache of the values of the positions
+
+        Returns
+        -------
+        value : float
+            The value of the best game found, -inf if all the placements simulated end the game
+
+        placement : tuple (int, int, int)
+            The first placement of the best game
+
+        evaluated : int
+            Number of placements simulated
+    """
+    table = table if table is not None else TranspositionTable(TABLE_SIZE)
+    best_value, best_placement = -math.inf, placements[0]
+    evaluated = 0
+
+    beam = [(0, tetris, None)]
+    for level in range(min(depth, KNOWN_PIECES)):
+        candidates, count, completed = _searchLevel(beam, level, tetris.score, deadline, weights, table, placements)
+        evaluated = evaluated + count
+
+        # The values of a level are only comparable if all its games have been searched,
+        # except in the first level, where each placement is a game
+        if len(candidates) > 0 and (completed or level == 0):
+            beam = _prune(candidates, beam_width)
+            best_value, best_placement = beam[0][0], beam[0][2]
+        if not completed or len(candidates) == 0:
+            break
+
+    return best_value, best_placement, evaluated
+
+# Cache of the values of the positions of a worker process
+_table = None
+
+def _initWorker(table_size):
+    global _table
+    _table = TranspositionTable(table_size)
+
+def _searchSubtrees(task):
+    """
+        Searches in a worker process the placements of the next block of some games of the beam (see BeamSearchPlayer.choose),
+        restored from their snapshots. Returns the best game found with the rank of its game in the beam,
+        the number of placements simulated and if the deadline did not stop the search.
+    """
+    engine, width, height, score, games, deadline, weights = task
+    beam, ranks = [], {}
+    for rank, snapshot, first in games:
+        game = engine(width, height)
+        game.restore(snapshot)
+        beam.append((None, game, first))
+        ranks[first] = rank
+
+    candidates, evaluated, completed = _searchLevel(beam, 1, score, deadline, weights, _table)
+    if len(candidates) == 0:
+        return -math.inf, None, None, evaluated, completed
+    value, _, first = max(candidates.values(), key=lambda candidate: candidate[0])
+    return value, ranks[first], first, evaluated, completed
+
+
+class BeamSearchPlayer:
+    def __init__(self, depth=2, beam_width=8, processes=None, time_budget=None, weights=WEIGHTS, table_size=TABLE_SIZE):
+        """
+            Plays by choosing the placement of each block with a beam search (see searchPlacements).
+            With a pool of processes, the placements of the current block are searched in this process,
+            then the games kept in the beam are split among the processes, that search the placements of the next block.
+            The beam is pruned before it is split, so the placement chosen does not depend on the number of processes.
+
+            Parameters
+            ----------
+            depth : int, optional
+                Number of blocks placed by the search, 1 for the current block and 2 for the current and the next block
+
+            beam_width : int, optional
+                Games kept at each level of the search
+
+            processes : int, optional
+                Number of processes, by default the number of cores. With 0 the search runs in this process
+
+            time_budget : float, optional
+                Maximum seconds of the search of a move, without limit if None
+
+            weights : dict, optional
+                Weights of the features (see WEIGHTS)
+
+            table_size : int, optional
+                Maximum number of entries of the cache of the values of each process
+
+            Raises
+            ------
+            ValueError
+                If the depth is not 1 or 2
+        """
+        if not 1 <= depth <= KNOWN_PIECES:
+            raise ValueError(f"The depth must be between 1 and {KNOWN_PIECES}, only the current and the next block are known")
+
+        self.depth = depth
+        self.beam_width = beam_width
+        self.time_budget = time_budget
+        self.weights = weights
+
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+        self._pool = multiprocessing.Pool(self.processes, _initWorker, (table_size,)) if self.processes > 0 else None
+        self._table = TranspositionTable(table_size)
+
+        self.moves = 0
+        self.evaluated = 0
+        self.seconds = 0
+
+    def choose(self, tetris):
+        """
+            Chooses the placement of the current block.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game, with a current block
+
+            Returns
+            -------
+            tuple (int, int, int)
+                The rotation, the x and the y of the placement (see Tetris.enumeratePlacements)
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.time_budget if self.time_budget is not None else math.inf
+        placements = tetris.enumeratePlacements()
+
+        if self._pool is None or self.depth == 1:
+            _, placement, evaluated = searchPlacements(tetris, placements, self.depth, self.beam_width, deadline, self.weights, self._table)
+        else:
+            placement, evaluated = self._searchPool(tetris, placements, deadline)
+
+        self.moves = self.moves + 1
+        self.evaluated = self.evaluated + evaluated
+        self.seconds = self.seconds + time.perf_counter() - start
+        return placement
+
+    def _searchPool(self, tetris, placements, deadline):
+        """
+            Searches the best placement of the current block as searchPlacements with a depth of 2,
+            the second level is split among the processes.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game, with a current block
+
+            placements : list of tuples (int, int, int)
+                The placements of the current block (see Tetris.enumeratePlacements)
+
+            deadline : float
+                Time (see time.monotonic) after which the search stops
+
+            Returns
+            -------
+            placement : tuple (int, int, int)
+                The first placement of the best game
+
+            evaluated : int
+                Number of placements simulated
+        """
+        candidates, evaluated, completed = _searchLevel([(0, tetris, None)], 0, tetris.score, deadline, self.weights, self._table, placements)
+        if len(candidates) == 0:
+            return placements[0], evaluated
+
+        beam = _prune(candidates, self.beam_width)
+        if not completed:
+            return beam[0][2], evaluated
+
+        results = self._pool.map(_searchSubtrees, [
+            (tetris.__class__, tetris.width, tetris.height, tetris.score,
+             [(rank, beam[rank][1].snapshot(), beam[rank][2]) for rank in range(i, len(beam), self.processes)],
+             deadline, self.weights)
+            for i in range(min(self.processes, len(beam)))
+        ])
+        evaluated = evaluated + sum(result[3] for result in results)
+
+        # As in searchPlacements, the second level is ignored if it is not completed,
+        # and among equal values the game reached first, from the best game of the beam, is chosen
+        completed = all(result[4] for result in results)
+        results = [result for result in results if result[1] is not None]
+        if len(results) == 0 or not completed:
+            return beam[0][2], evaluated
+        _, _, placement, _, _ = max(results, key=lambda result: (result[0], -result[1]))
+        return placement, evaluated
+
+    def play(self, tetris):
+        """
+            Places the current block and updates the game until the next block is placed.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game
+
+            Returns
+            -------
+            bool
+                False if the game is over
+        """
+        if tetris.getCurrentBlock() is None and not tetris.nextStep():
+            return False
+
+        tetris.place(*self.choose(tetris))
+        tetris.nextStep()  # Locks the block
+        return tetris.nextStep()
+
+    def getStats(self):
+        """
+            Returns the statistics of the searches.
+
+            Returns
+            -------
+            stats : dict
+                Moves, placements simulated, seconds of search and placements simulated per second
+        """
+        return {
+            "moves": self.moves,
+            "placements": self.evaluated,
+            "seconds": self.seconds,
+            "placements_per_second": self.evaluated / self.seconds if self.seconds > 0 else 0,
+        }
+
+    def close(self):
+        """
+            Stops the processes.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
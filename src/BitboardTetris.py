@@ -0,0 +1,344 @@
+from Tetris import Tetris, OverlapError, COLOR_CODES
+
+_bits = {}
+
+def _getBits(mask):
+    """
+        Returns the indexes of the set bits of a mask, they are computed once for each mask.
+
+        Parameters
+        ----------
+        mask : int
+            The bitmask
+
+        Returns
+        -------
+        tuple of int
+            The indexes, from the lowest bit
+    """
+    if mask not in _bits:
+        _bits[mask] = tuple(x for x in range(mask.bit_length()) if (mask >> x) & 1)
+    return _bits[mask]
+
+
+class BitboardTetris(Tetris):
+    """
+        Tetris game where the occupancy of the grid is also stored as a bitmask for each row.
+
+        The bit x of a row is set if the cell in the column x is occupied.
+        The grid is still kept as the map from each cell to the block that owns it.
+    """
+    def __init__(self, width, height, seed=None, generator=None):
+        self._FULL_MASK = (1 << width) - 1
+
+        super().__init__(width, height, seed, generator)
+
+    def _newGame(self, seed, generator):
+        """
+            Starts a new game on an empty grid (see Tetris._newGame).
+        """
+        self._rows = [0 for y in range(self.height)]
+        super()._newGame(seed, generator)
+
+    def _canFall(self, block):
+        """
+            Tells if a specific block can fall in the current configuration of the grid
+
+            Parameters
+            ----------
+            block : Block
+                The block that has to be checked
+
+            Returns
+            -------
+            bool
+                False : if something is under the block or it arrived at the bottom
+                True  : otherwise (it can fall)
+        """
+        # Arrived at the bottom
+        if (block.y + block.height-1) == self.height-1:
+            return False
+
+        # Checks the bottom of the block, only the lowest solid cell of each column is considered
+        bottom_masks = block.getBottomMasks()
+        for y in range(block.height):
+            if (bottom_masks[y] << block.x) & self._rows[block.y + y + 1]:
+                return False
+
+        return True
+
+    def fits(self, block, x, y, rotation=None):
+        """
+            Tells if a block can be placed in a position of the grid (see Tetris.fits).
+            Only the cells where the masks collide are checked one by one.
+
+            Parameters
+            ----------
+            block : Block
+                The block to check
+
+            x, y : int
+                The position of the top-left corner of the block
+
+            rotation : int, optional
+                The rotation of the block, the current one if None
+
+            Returns
+            -------
+            bool
+                True  : if the block is inside the grid and does not overlap other blocks
+                False : otherwise
+        """
+        shape, width = block.getShape(rotation)
+        if x < 0 or y < 0 or x + width > self.width or y + len(shape) > self.height:
+            return False
+
+        for i in range(len(shape)):
+            collision = self._rows[y+i] & (shape[i] << x)
+            while collision:
+                # The colliding cell can be taken by the block itself
+                bit = collision & -collision
+                if self.grid[y+i][bit.bit_length()-1] is not block:
+                    return False
+                collision = collision ^ bit
+
+        return True
+
+    def _insertBlock(self, block):
+        """
+            Inserts the block in the grid. The position is specified in the block object.
+            The grid is not modified if the block cannot be inserted.
+            The bitmasks, the counts and the changed rows are updated once for each row of the block.
+
+            Parameters
+            ----------
+            block : Block
+            The block to insert in the grid
+
+            Raises
+            -------
+            OverlapError
+                If the new block overlaps with an existing block
+            IndexError
+                If the block is out of the grid
+        """
+        masks = block.getRowMasks()
+        rows = self._rows
+        block_x, block_y = block.x, block.y
+
+        for y in range(block.height):
+            mask = masks[y] << block_x
+            if mask & ~self._FULL_MASK:
+                raise IndexError("Block out of the grid")
+            if rows[block_y+y] & mask:
+                raise OverlapError("Blocks are overlapping")
+
+        code = COLOR_CODES[block.color]
+        tops = self._column_tops
+        cells = self._cells
+        for y in range(block_y, block_y + block.height):
+            mask = masks[y - block_y] << block_x
+            if mask == 0:
+                continue
+
+            row = self._ownRow(y) if self._shared_rows[y] else self.grid[y]
+            start = y*self.width
+            rows[y] = rows[y] | mask
+            columns = _getBits(mask)
+            self._row_counts[y] = self._row_counts[y] + len(columns)
+            for x in columns:
+                row[x] = block
+                cells[start + x] = code
+                if y < tops[x]:
+                    tops[x] = y
+            self._changed_rows.add(y)
+            self._modified_rows.add(y)
+        self._hash = self._hash ^ self._getBlockHash(block)
+
+    def _removeBlock(self, block):
+        """
+            Removes the block in the grid. The position is specified in the block object.
+            Only the cells owned by the block are cleared.
+
+            Parameters
+            ----------
+            block : Block
+            The block to remove in the grid
+        """
+        self._hash = self._hash ^ self._getBlockHash(block)
+        masks = block.getRowMasks()
+        rows = self._rows
+        tops = self._column_tops
+        cells = self._cells
+
+        for y in range(max(0, block.y), min(self.height, block.y + block.height)):
+            mask = (masks[y - block.y] << block.x) & rows[y]
+            if mask == 0:
+                continue
+
+            row = self._ownRow(y) if self._shared_rows[y] else self.grid[y]
+            start = y*self.width
+            for x in _getBits(mask):
+                if row[x] is not block:
+                    continue
+                row[x] = None
+                cells[start + x] = 0
+                rows[y] = rows[y] & ~(1 << x)
+                self._row_counts[y] = self._row_counts[y] - 1
+                if y == tops[x]:
+                    # Searches for the new highest cell of the column
+                    top = y
+                    while top < self.height and self.grid[top][x] is None:
+                        top = top + 1
+                    tops[x] = top
+            self._modified_rows.add(y)
+
+    def _moveBlock(self, block, x, y, rotation=None):
+        """
+            Moves a block of the grid to a new position and rotation (see Tetris._moveBlock).
+            When the block stays in some of its rows, the bitmasks of the rows before and after the move are compared,
+            so only the cells that the block leaves or takes are written.
+
+            Parameters
+            ----------
+            block : Block
+                The block to move
+
+            x, y : int
+                The new position of the top-left corner of the block
+
+            rotation : int, optional
+                The new rotation of the block, the current one if None
+
+            Returns
+            -------
+            Block
+                The moved block, a copy of the given one if it was shared with a clone
+        """
+        old_masks, old_x, old_y = block.getRowMasks(), block.x, block.y
+        masks = block.getShape(rotation)[0]
+        if y >= old_y + len(old_masks) or old_y >= y + len(masks):
+            # The old and the new cells are in different rows, they are all written
+            return super()._moveBlock(block, x, y, rotation)
+
+        block = self._ownBlock(block)
+        self._hash = self._hash ^ self._getBlockHash(block)
+        if rotation is not None:
+            for _ in range((rotation - block.rotation) % 4):
+                block.rotate()
+        block.x, block.y = x, y
+        self._hash = self._hash ^ self._getBlockHash(block)
+
+        code = COLOR_CODES[block.color]
+        rows = self._rows
+        tops = self._column_tops
+        cells = self._cells
+        for row_y in range(min(old_y, y), max(old_y + len(old_masks), y + len(masks))):
+            old = old_masks[row_y - old_y] << old_x if 0 <= row_y - old_y < len(old_masks) else 0
+            new = masks[row_y - y] << x if 0 <= row_y - y < len(masks) else 0
+            if old == new:
+                continue
+
+            row = self._ownRow(row_y) if self._shared_rows[row_y] else self.grid[row_y]
+            start = row_y*self.width
+            added, removed = _getBits(new & ~old), _getBits(old & ~new)
+            rows[row_y] = (rows[row_y] & ~old) | new
+            self._row_counts[row_y] = self._row_counts[row_y] + len(added) - len(removed)
+            for cell_x in added:
+                row[cell_x] = block
+                cells[start + cell_x] = code
+                if row_y < tops[cell_x]:
+                    tops[cell_x] = row_y
+            for cell_x in removed:
+                row[cell_x] = None
+                cells[start + cell_x] = 0
+                if row_y == tops[cell_x]:
+                    # Searches for the new highest cell of the column
+                    top = row_y
+                    while top < self.height and self.grid[top][cell_x] is None:
+                        top = top + 1
+                    tops[cell_x] = top
+            if len(added) > 0:
+                self._changed_rows.add(row_y)
+            self._modified_rows.add(row_y)
+
+        return block
+
+    def clone(self):
+        """
+            Returns an independent copy of the game (see Tetris.clone).
+
+            Returns
+            -------
+            BitboardTetris
+                The copy of the game
+        """
+        new_game = super().clone()
+        new_game._rows = list(self._rows)
+        return new_game
+
+    def snapshot(self):
+        """
+            Returns the state of the game in a compact immutable form (see Tetris.snapshot).
+
+            Returns
+            -------
+            Snapshot
+                The state of the game, including the bitmasks of the rows
+        """
+        return super().snapshot()._replace(rows=tuple(self._rows))
+
+    def restore(self, snapshot):
+        """
+            Restores a state of the game (see Tetris.restore).
+
+            Parameters
+            ----------
+            snapshot : Snapshot
+                A state of a BitboardTetris game of the same size
+        """
+        super().restore(snapshot)
+        self._rows = list(snapshot.rows)
+
+    def _isFullRow(self, row):
+        """
+            Checks if a row only contains blocks.
+
+            Parameters
+            ----------
+            row : int
+                The row to check
+
+            Returns
+            -------
+            bool
+                True  : if the row is full
+                False : otherwise
+        """
+        return self._rows[row] == self._FULL_MASK
+
+    def _clearRow(self, row):
+        """
+            Empties every cell of a row at once (see Tetris._clearRow).
+
+            Parameters
+            ----------
+            row : int
+                The row to clear
+        """
+        rows = self._rows
+        tops = self._column_tops
+        rows[row] = 0
+        self.grid[row] = [None for x in range(self.width)]
+        self._shared_rows[row] = False
+        self._cells[row*self.width:(row+1)*self.width] = bytes(self.width)
+        self._row_counts[row] = 0
+        self._modified_rows.add(row)
+
+        for x in range(self.width):
+            if tops[x] == row:
+                # Searches for the new highest cell of the column
+                top = row
+                while top < self.height and self.grid[top][x] is None:
+                    top = top + 1
+                tops[x] = top
@@ -1,23 +1,272 @@
 from settings import BLOCKS, COLORS
-import random
-import copy
+
+def _packShape(shape):
+    """
+        Converts a shape from a matrix to a bitmask for each row.
+        The bit x of a mask is set if the cell in the column x is solid.
+
+        Parameters
+        ----------
+        shape : matrix
+            The shape
+
+        Returns
+        -------
+        tuple of int
+            The bitmasks of the rows, from top to bottom
+    """
+    masks = []
+    for row in shape:
+        mask = 0
+        for x in range(len(row)):
+            if row[x]:
+                mask = mask | (1 << x)
+        masks.append(mask)
+    return tuple(masks)
+
+def _computeProfiles(shape, width):
+    """
+        Computes the data used to check the collisions of a shape.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            The bitmasks of the rows of the shape
+
+        width : int
+            The width of the shape
+
+        Returns
+        -------
+        bottom_masks : tuple of int
+            For each row, the bitmask of the lowest solid cell of each column
+
+        bottom, left, right : tuple of tuples (int, int)
+            Coordinates relative to the block of the cells that are checked when it moves (see Block.getBottomProfile)
+    """
+    height = len(shape)
+
+    bottom_masks = [0 for y in range(height)]
+    bottom = []
+    for x in range(width):
+        # Searches for the lowest solid cell, a column could be without solid cells
+        y = height-1
+        while y >= 0 and not (shape[y] >> x) & 1:
+            y = y-1
+        if y >= 0:
+            bottom.append((x, y+1))
+            bottom_masks[y] = bottom_masks[y] | (1 << x)
+
+    left, right = [], []
+    for y in range(height):
+        # Solid cells without a solid cell on their left/right
+        left_edge = shape[y] & ~(shape[y] << 1)
+        right_edge = shape[y] & ~(shape[y] >> 1)
+        for x in range(width):
+            if (left_edge >> x) & 1:
+                left.append((x-1, y))
+            if (right_edge >> x) & 1:
+                right.append((x+1, y))
+
+    return tuple(bottom_masks), tuple(bottom), tuple(left), tuple(right)
+
+def _rotateShape(shape, width, clockwise=True):
+    """
+        Rotates a shape.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            The bitmasks of the rows of the shape to rotate
+
+        width : int
+            The width of the shape
+
+        clockwise : bool, optional
+            If True, it performs a 90° rotation
+            If False, it performs a -90° rotation
+
+        Returns
+        -------
+        tuple of int
+            The rotated shape, its width is the height of the original shape
+    """
+    height = len(shape)
+    new_shape = []
+    for y in range(width):
+        mask = 0
+        for x in range(height):
+            if clockwise:
+                solid = (shape[height-1 - x] >> y) & 1   # 90° rotation
+            else:
+                solid = (shape[x] >> (width-1 - y)) & 1  # -90° rotation
+            mask = mask | (solid << x)
+        new_shape.append(mask)
+    return tuple(new_shape)
+
+# For each shape in BLOCKS, its 4 rotations (each one rotated clockwise from the previous one), their widths and profiles.
+# They are shared by all the blocks
+ROTATIONS = []
+WIDTHS = []
+for _shape in BLOCKS:
+    ROTATIONS.append([_packShape(_shape)])
+    WIDTHS.append([len(_shape[0])])
+    for _ in range(3):
+        ROTATIONS[-1].append(_rotateShape(ROTATIONS[-1][-1], WIDTHS[-1][-1]))
+        WIDTHS[-1].append(len(ROTATIONS[-1][-2]))
+PROFILES = [[_computeProfiles(ROTATIONS[i][r], WIDTHS[i][r]) for r in range(4)] for i in range(len(BLOCKS))]
 
 class Block:
-    def __init__(self, x, y):
+    __slots__ = ("x", "y", "color", "piece", "rotation", "shape", "width", "height", "_profiles", "owner")
+
+    def __init__(self, x, y, shape, color):
         """
-            Initialize a block with a random shape and color.
+            Initialize a block.
+
+            The shape is stored as a bitmask for each row (see getRowMasks).
 
             Parameters
             ----------
             x, y : int
                 (x, y) coordinates referring to the top-left corner of the block
+
+            shape, color : int
+                Indexes of the shape in BLOCKS and of the color in COLORS (see PieceGenerator)
         """
         self.x, self.y = x, y
-        self.color = random.choice(COLORS)
-        self.shape = copy.deepcopy(random.choice(BLOCKS))
+        self.color = COLORS[color]
+
+        # The block is a whole piece as long as piece is not None, its shape is ROTATIONS[piece][rotation]
+        self.piece = shape
+        self.rotation = 0
+        self._setShape(ROTATIONS[shape][0], WIDTHS[shape][0], PROFILES[shape][0])
+
+        # Token of the game that is allowed to modify the block (see Tetris.clone)
+        self.owner = None
+
+    def getState(self):
+        """
+            Returns the state of the block.
+
+            Returns
+            -------
+            tuple
+                Immutable representation of the block, that can be restored with fromState
+        """
+        return (self.x, self.y, self.color, self.piece, self.rotation, self.shape, self.width, self._profiles)
+
+    @classmethod
+    def fromState(cls, state):
+        """
+            Creates a block from its state.
+
+            Parameters
+            ----------
+            state : tuple
+                The state of the block (see getState)
+
+            Returns
+            -------
+            Block
+                The new block
+        """
+        block = cls.__new__(cls)
+        block.x, block.y, block.color, block.piece, block.rotation, block.shape, block.width, block._profiles = state
+        block.height = len(block.shape)
+        block.owner = None
+        return block
+
+    def copy(self):
+        """
+            Returns a copy of the block, without owner.
+
+            Returns
+            -------
+            Block
+                The new block
+        """
+        return Block.fromState(self.getState())
+
+    def _setShape(self, shape, width, profiles=None):
+        """
+            Sets the shape of the block
+
+            Parameters
+            ----------
+            shape : tuple of int
+                The bitmasks of the rows of the new shape
+
+            width : int
+                The width of the new shape
+
+            profiles : tuple, optional
+                The precomputed profiles of the shape, computed when needed if None
+        """
+        self.shape = shape
+
+        self.width = width
+        self.height = len(shape)
+        self._profiles = profiles
+
+    def _getProfiles(self):
+        """
+            Returns the profiles of the current shape (see _computeProfiles)
+        """
+        if self._profiles is None:
+            self._profiles = _computeProfiles(self.shape, self.width)
+        return self._profiles
+
+    def isSolid(self, x, y):
+        """
+            Tells if a cell of the shape is solid
+
+            Parameters
+            ----------
+            x, y : int
+                Coordinates of the cell, relative to the top-left corner of the block
+
+            Returns
+            -------
+            bool
+                True  : if the cell is solid
+                False : otherwise
+        """
+        return (self.shape[y] >> x) & 1 == 1
 
-        self.width = len(self.shape[0])
-        self.height = len(self.shape)
+    def getBottomProfile(self):
+        """
+            Returns the position of the bottom of the block, relative to its top-left corner.
+
+            Returns
+            -------
+            coords : tuple of tuples (int, int)
+                Tuples containing the relative coordinates (x, y)
+        """
+        return self._getProfiles()[1]
+
+    def getLeftProfile(self):
+        """
+            Returns the position of the cells on the left of the block, relative to its top-left corner.
+            These are the cells taken by the block when it moves to left.
+
+            Returns
+            -------
+            coords : tuple of tuples (int, int)
+                Tuples containing the relative coordinates (x, y)
+        """
+        return self._getProfiles()[2]
+
+    def getRightProfile(self):
+        """
+            Returns the position of the cells on the right of the block, relative to its top-left corner.
+            These are the cells taken by the block when it moves to right.
+
+            Returns
+            -------
+            coords : tuple of tuples (int, int)
+                Tuples containing the relative coordinates (x, y)
+        """
+        return self._getProfiles()[3]
 
     def getBottomCoords(self):
         """
@@ -35,22 +284,7 @@ class Block:
             [True,  X,    X  ]
               X
         """
-        coords = []
-
-        for x in range(self.width):
-            # Starting from the bottom, the position below the first solid cell is considered
-            if self.shape[self.height-1][x] is not None:
-                coords.append((self.x + x, self.y + self.height))
-            else:
-                # Searches for the first solid cell
-                y = self.height-2
-                while y >= 0 and self.shape[y][x] is None:
-                    y = y-1
-
-                if self.shape[y][x] is not None:  # Could be a column without solid block
-                    coords.append((self.x + x, self.y + y + 1))
-
-        return coords
+        return [(self.x + x, self.y + y) for x, y in self.getBottomProfile()]
 
     def clearRow(self, row):
         """
@@ -62,22 +296,74 @@ class Block:
                 The row to delete
         """
         if 0 <= row < self.height:
-            for i in range(self.width):
-                self.shape[row][i] = None
+            self._changeShape(self.shape[:row] + (0,) + self.shape[row+1:])
 
     def _changeShape(self, shape):
         """
-            Updates the shape of the block
+            Updates the shape of the block, keeping its width. The block is no more a whole piece.
 
             Parameters
             ----------
-                shape : matrix
-                    The new shape
+                shape : tuple of int
+                    The bitmasks of the rows of the new shape
         """
-        self.shape = shape
+        self.piece = None
+        self.rotation = None
+        self._setShape(shape, self.width)
+
+    def getRowMasks(self):
+        """
+            Returns the shape of the block as a list of bitmasks, one for each row.
+            The bit x of a mask is set if the cell in the column x is solid.
+
+            Returns
+            -------
+            masks : tuple of int
+                The bitmasks of the rows, from top to bottom
+
+            Examples
+            --------
+            For the following 'L' shaped block, it returns (0b111, 0b001)
+            [True, True, True]
+            [True, None, None]
+        """
+        return self.shape
 
-        self.width = len(self.shape[0])
-        self.height = len(self.shape)
+    def getBottomMasks(self):
+        """
+            Returns the bottom of the block as a list of bitmasks, one for each row.
+            The bit x of a mask is set if the cell in the column x is the lowest solid cell of the column.
+
+            Returns
+            -------
+            masks : list of int
+                The bitmasks of the rows, from top to bottom
+        """
+        return self._getProfiles()[0]
+
+    def getShape(self, rotation=None):
+        """
+            Returns the shape of the block with a given rotation, without rotating it.
+
+            Parameters
+            ----------
+            rotation : int, optional
+                Index of the rotation in ROTATIONS, the current shape if None.
+                Only whole pieces can be rotated.
+
+            Returns
+            -------
+            shape : tuple of int
+                The bitmasks of the rows of the shape
+
+            width : int
+                The width of the shape
+        """
+        if rotation is None or rotation == self.rotation:
+            return self.shape, self.width
+        if self.piece is None:
+            raise ValueError("Only whole pieces have rotations")
+        return ROTATIONS[self.piece][rotation], WIDTHS[self.piece][rotation]
 
     def rotate(self, clockwise=True):
         """
@@ -89,13 +375,11 @@ class Block:
                 If True, it performs a 90° rotation
                 If False, it performs a -90° rotation
         """
-        if clockwise:
-            new_shape = list(zip(*reversed(self.shape)))        # 90° rotation
+        if self.piece is not None:
+            self.rotation = (self.rotation + (1 if clockwise else -1)) % 4
+            self._setShape(ROTATIONS[self.piece][self.rotation], WIDTHS[self.piece][self.rotation], PROFILES[self.piece][self.rotation])
         else:
-            new_shape = list(reversed(list(zip(*self.shape))))  # -90° rotation
-        new_shape = [list(t) for t in new_shape]  # Convert to list
-
-        self._changeShape(new_shape)
+            self._setShape(_rotateShape(self.shape, self.width, clockwise), self.height)
 
     def _isEmptyRow(self, row):
         """
@@ -112,10 +396,42 @@ class Block:
                 False : the row contains a solid block
                 True  : otherwise
         """
-        for x in range(self.width):
-            if self.shape[row][x]:
-                return False
-        return True
+        return self.shape[row] == 0
+
+    def hasEmptyRow(self):
+        """
+            Checks if the shape contains an empty row, so that the block has to be split
+
+            Returns
+            -------
+            bool
+                True  : if at least a row is empty
+                False : otherwise
+        """
+        return 0 in self.shape
+
+    def _fragment(self, start, end):
+        """
+            Creates a new block with some rows of the shape of this block.
+            The new block shares the color of this block.
+
+            Parameters
+            ----------
+            start, end : int
+                The first row and the row after the last one
+
+            Returns
+            -------
+            Block
+                The new block
+        """
+        new_block = Block.__new__(Block)
+        new_block.x, new_block.y = self.x, self.y + start
+        new_block.color = self.color
+        new_block.width = self.width
+        new_block.owner = None
+        new_block._changeShape(self.shape[start:end])
+        return new_block
 
     def dismantle(self):
         """
@@ -132,17 +448,11 @@ class Block:
         for i in range(self.height):
             if self._isEmptyRow(i):
                 # Creates a new block if it is at least 1 block high
-                if (len(self.shape[start:i]) > 0):
-                    new_block = copy.deepcopy(self)
-                    new_block.y = self.y + start
-                    new_block._changeShape(new_block.shape[start:i])
-                    new_blocks.append(new_block)
+                if i > start:
+                    new_blocks.append(self._fragment(start, i))
                 start = i+1
         # Creates a block with the remaining part (if needed)
-        if (len(self.shape[start:]) > 0):
-            new_block = copy.deepcopy(self)
-            new_block.y = self.y + start
-            new_block._changeShape(new_block.shape[start:])
-            new_blocks.append(new_block)
+        if self.height > start:
+            new_blocks.append(self._fragment(start, self.height))
 
         return new_blocks
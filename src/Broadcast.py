@@ -0,0 +1,362 @@
+import struct
+from Block import ROTATIONS, WIDTHS
+from Tetris import COLOR_CODES
+
+# A game is broadcast as a message for each tick where something changed, each one starts with its type and the tick.
+# A KEYFRAME contains the whole state, a DELTA contains only the parts that changed since the previous message.
+# The cells are the ones of the blocks already placed (see getCells), the current piece is sent as its position and rotation,
+# so a moving piece does not change any cell.
+#
+# KEYFRAME: header, cells (width*height color codes, see COLOR_CODES), PIECE, NEXT
+# DELTA:    header, then the parts in the flags, in this order:
+#             CELLS: number of changed cells, then the index (y*width + x) and the new color code of each one
+#             PIECE: the current piece
+#             NEXT:  the next piece
+#             SCORE: the score
+KEYFRAME = struct.Struct("<BIHHI")  # Type, tick, width, height, score
+DELTA = struct.Struct("<BIB")       # Type, tick, flags
+COUNT = struct.Struct("<H")
+CELL = struct.Struct("<HB")         # Index, color code (the index has 4 bytes when the grid has more than 65536 cells)
+WIDE_CELL = struct.Struct("<IB")
+PIECE = struct.Struct("<BBhhB")     # Piece (NO_PIECE if there is no current piece), rotation, x, y, color code
+NEXT = struct.Struct("<BB")         # Piece, color code
+SCORE = struct.Struct("<I")
+MSG_KEYFRAME = 1
+MSG_DELTA = 2
+HAS_CELLS = 1
+HAS_PIECE = 2
+HAS_NEXT = 4
+HAS_SCORE = 8
+NO_PIECE = 255
+
+# Messages are sent on a stream prefixed by their length
+LENGTH = struct.Struct("<I")
+
+# Ticks between two keyframes, a spectator that joins a game receives the last keyframe and the following deltas
+KEYFRAME_INTERVAL = 120
+
+# Deltas are not sent to a spectator that is not reading them while this many bytes are waiting to be sent,
+# it receives again the messages from the next keyframe when its buffer is emptied
+MAX_WRITE_BUFFER = 1 << 16
+
+def _pieceState(block):
+    """
+        Returns the position of a whole piece as sent in the messages (see PIECE).
+    """
+    if block is None:
+        return (NO_PIECE, 0, 0, 0, 0)
+    return (block.piece, block.rotation, block.x, block.y, COLOR_CODES[block.color])
+
+
+class DeltaEncoder:
+    def __init__(self, tetris, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+            Encodes the changes of a game at each tick.
+            Only the rows modified since the previous tick are compared (see Tetris.takeModifiedRows).
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game, it should not be encoded by other encoders
+
+            keyframe_interval : int, optional
+                Ticks between two keyframes
+        """
+        self.tetris = tetris
+        self.keyframe_interval = keyframe_interval
+        self.ticks = 0
+
+        self._cells = bytearray(tetris.width * tetris.height)  # Cells of the placed blocks, as sent
+        self._cell = CELL if len(self._cells) <= 1 << 16 else WIDE_CELL
+        self._block = None    # Current block, as sent
+        self._piece = None
+        self._next = None
+        self._score = None
+
+    def _updateRows(self, rows):
+        """
+            Updates the sent cells with the placed blocks in some rows.
+
+            Parameters
+            ----------
+            rows : iterable of int
+                Indexes of the rows
+
+            Returns
+            -------
+            changes : list of (int, int)
+                The index and the new color code of the changed cells
+        """
+        width = self.tetris.width
+        cells = self.tetris.getCells()
+        block = self.tetris.getCurrentBlock()
+        changes = []
+
+        for y in sorted(rows):
+            start = y * width
+            row = bytearray(cells[start:start+width])
+            if block is not None and block.y <= y < block.y + block.height:
+                # Removes the current piece
+                mask = block.shape[y - block.y]
+                for x in range(block.width):
+                    if (mask >> x) & 1:
+                        row[block.x + x] = 0
+
+            if row != self._cells[start:start+width]:
+                for x in range(width):
+                    if row[x] != self._cells[start + x]:
+                        changes.append((start + x, row[x]))
+                self._cells[start:start+width] = row
+
+        return changes
+
+    def _keyframe(self):
+        """
+            Returns a keyframe of the current state.
+        """
+        return b"".join([
+            KEYFRAME.pack(MSG_KEYFRAME, self.ticks, self.tetris.width, self.tetris.height, self._score),
+            self._cells,
+            PIECE.pack(*self._piece),
+            NEXT.pack(*self._next),
+        ])
+
+    def encode(self):
+        """
+            Encodes the changes since the previous call. It should be called after each tick of the game.
+
+            Returns
+            -------
+            message : bytes
+                A keyframe or a delta, None if nothing changed
+
+            keyframe : bool
+                True if the message is a keyframe
+        """
+        tetris = self.tetris
+        rows = tetris.takeModifiedRows()
+        block = tetris.getCurrentBlock()
+        if self._block is not None and self._block is not block:
+            # The previous current block has been placed, where it was last sent
+            rows.update(range(self._piece[3], self._piece[3] + self._block.height))
+        changes = self._updateRows(rows)
+
+        piece = _pieceState(block)
+        next_piece = (tetris.next_block.piece, COLOR_CODES[tetris.next_block.color])
+        score = tetris.score
+
+        keyframe = self.ticks % self.keyframe_interval == 0 or len(changes) * self._cell.size > len(self._cells)
+        if keyframe:
+            self._block, self._piece, self._next, self._score = block, piece, next_piece, score
+            message = self._keyframe()
+        else:
+            flags = 0
+            parts = [None]
+            if len(changes) > 0:
+                flags = flags | HAS_CELLS
+                parts.append(COUNT.pack(len(changes)))
+                parts.extend(self._cell.pack(index, color) for index, color in changes)
+            if piece != self._piece:
+                flags = flags | HAS_PIECE
+                parts.append(PIECE.pack(*piece))
+            if next_piece != self._next:
+                flags = flags | HAS_NEXT
+                parts.append(NEXT.pack(*next_piece))
+            if score != self._score:
+                flags = flags | HAS_SCORE
+                parts.append(SCORE.pack(score))
+            self._block, self._piece, self._next, self._score = block, piece, next_piece, score
+
+            if flags == 0:
+                message = None
+            else:
+                parts[0] = DELTA.pack(MSG_DELTA, self.ticks, flags)
+                message = b"".join(parts)
+
+        self.ticks = self.ticks + 1
+        return message, keyframe
+
+
+class DeltaDecoder:
+    def __init__(self):
+        """
+            Rebuilds the state of a game from its messages (see DeltaEncoder).
+            The deltas received before the first keyframe are ignored.
+        """
+        self.width = None
+        self.height = None
+        self.tick = None
+        self.score = None
+        self.piece = None       # (piece, rotation, x, y, color code), piece is NO_PIECE when there is no current piece
+        self.next_piece = None  # (piece, color code)
+        self._cells = None
+        self._cell = None
+
+    def isSynced(self):
+        """
+            Tells if a keyframe has been received.
+
+            Returns
+            -------
+            bool
+                True if the state is known
+        """
+        return self._cells is not None
+
+    def apply(self, message):
+        """
+            Updates the state with a message.
+
+            Parameters
+            ----------
+            message : bytes-like
+                A keyframe or a delta
+        """
+        if message[0] == MSG_KEYFRAME:
+            _, self.tick, self.width, self.height, self.score = KEYFRAME.unpack_from(message)
+            offset = KEYFRAME.size
+            size = self.width * self.height
+            self._cells = bytearray(message[offset:offset+size])
+            self._cell = CELL if size <= 1 << 16 else WIDE_CELL
+            offset = offset + size
+            self.piece = PIECE.unpack_from(message, offset)
+            self.next_piece = NEXT.unpack_from(message, offset + PIECE.size)
+            return
+
+        if not self.isSynced():
+            return
+        _, self.tick, flags = DELTA.unpack_from(message)
+        offset = DELTA.size
+        if flags & HAS_CELLS:
+            count, = COUNT.unpack_from(message, offset)
+            offset = offset + COUNT.size
+            for index, color in self._cell.iter_unpack(message[offset:offset + count*self._cell.size]):
+                self._cells[index] = color
+            offset = offset + count*self._cell.size
+        if flags & HAS_PIECE:
+            self.piece = PIECE.unpack_from(message, offset)
+            offset = offset + PIECE.size
+        if flags & HAS_NEXT:
+            self.next_piece = NEXT.unpack_from(message, offset)
+            offset = offset + NEXT.size
+        if flags & HAS_SCORE:
+            self.score, = SCORE.unpack_from(message, offset)
+
+    def getCells(self):
+        """
+            Returns the color code of each cell, with the current piece.
+
+            Returns
+            -------
+            bytearray
+                The codes of the cells, row by row (see Tetris.getCells)
+        """
+        cells = bytearray(self._cells)
+        piece, rotation, x, y, color = self.piece
+        if piece != NO_PIECE:
+            shape = ROTATIONS[piece][rotation]
+            for dy in range(len(shape)):
+                for dx in range(WIDTHS[piece][rotation]):
+                    if (shape[dy] >> dx) & 1:
+                        cells[(y + dy) * self.width + x + dx] = color
+        return cells
+
+
+class SpectatorPublisher:
+    def __init__(self, tetris, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+            Sends the changes of a game to its spectators.
+            Each message is encoded once and the same bytes are written to all the spectators.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game
+
+            keyframe_interval : int, optional
+                Ticks between two keyframes
+        """
+        self._encoder = DeltaEncoder(tetris, keyframe_interval)
+        self._spectators = set()
+        self._lagging = set()  # Spectators waiting for the next keyframe
+        self._backlog = []     # Messages from the last keyframe, sent to the new spectators
+
+        self.messages = 0
+        self.bytes = 0         # Bytes of the encoded messages, each one counted once
+
+    def subscribe(self, transport):
+        """
+            Adds a spectator, it immediately receives the messages from the last keyframe.
+
+            Parameters
+            ----------
+            transport : asyncio.Transport
+                Connection with the spectator
+        """
+        for frame in self._backlog:
+            transport.write(frame)
+        if len(self._backlog) > 0:
+            self._spectators.add(transport)
+        else:
+            self._lagging.add(transport)
+
+    def unsubscribe(self, transport):
+        """
+            Removes a spectator.
+
+            Parameters
+            ----------
+            transport : asyncio.Transport
+                Connection with the spectator
+        """
+        self._spectators.discard(transport)
+        self._lagging.discard(transport)
+
+    def getSpectators(self):
+        """
+            Returns the number of spectators.
+
+            Returns
+            -------
+            int
+                The number of spectators
+        """
+        return len(self._spectators) + len(self._lagging)
+
+    def publish(self):
+        """
+            Sends the changes since the previous call to the spectators. It should be called after each tick of the game.
+        """
+        message, keyframe = self._encoder.encode()
+        if message is None:
+            return
+        frame = LENGTH.pack(len(message)) + message
+        self.messages = self.messages + 1
+        self.bytes = self.bytes + len(frame)
+
+        if keyframe:
+            self._backlog = [frame]
+            # The spectators that were not reading are synced again, if they can receive the keyframe
+            for transport in list(self._lagging):
+                if transport.get_write_buffer_size() <= MAX_WRITE_BUFFER:
+                    self._lagging.discard(transport)
+                    self._spectators.add(transport)
+        else:
+            self._backlog.append(frame)
+
+        for transport in self._spectators:
+            if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                self._lagging.add(transport)
+            else:
+                transport.write(frame)
+        if len(self._lagging) > 0:
+            self._spectators.difference_update(self._lagging)
+
+    def close(self):
+        """
+            Closes the connections of the spectators.
+        """
+        for transport in self._spectators | self._lagging:
+            transport.close()
+        self._spectators.clear()
+        self._lagging.clear()
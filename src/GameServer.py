@@ -0,0 +1,467 @@
+import asyncio
+import heapq
+import random
+import struct
+import time
+from settings import FALL_DELAY_START, FALL_DELAY_DECREASE_RATE, FALL_DELAY_SCORE_THRESHOLD
+from Tetris import Tetris
+from sim import applyAction
+from Profiler import Profiler
+from Broadcast import SpectatorPublisher
+
+# Messages sent to the clients, each one starts with its type.
+# HELLO is sent when the client connects, STATE after each tick that changed the game (followed by the cells of the grid,
+# see Tetris.getCells), OVER when the game is over, then the connection is closed.
+# The clients send their inputs as the keys in sim.ACTION_KEYS, one byte each (the others are ignored)
+HELLO = struct.Struct("<BHHqI")  # Type, width, height, seed, id of the session
+STATE = struct.Struct("<BII")    # Type, steps of the game, score
+MSG_HELLO = 0
+MSG_STATE = 1
+MSG_OVER = 2
+
+# The spectators connect to their own port and send the id of the session to watch,
+# then they receive the changes of the game (see Broadcast)
+WATCH = struct.Struct("<I")
+
+# Inputs applied to a session in a single tick, the others are dropped
+MAX_INPUTS_PER_TICK = 16
+
+# Fraction of the tick delay that a tick can spend on the inputs and on the steps of the games.
+# When the server is overloaded the remaining work is left to the next ticks, so the ticks keep a bounded duration
+TICK_BUDGET = 0.75
+
+# The states are not sent to a client that is not reading them while this many bytes are waiting to be sent,
+# it will receive the next state when its buffer is emptied
+MAX_WRITE_BUFFER = 1 << 16
+
+class Session:
+    __slots__ = ("id", "tetris", "seed", "transport", "inputs", "fall_delay", "score_at_last_delay_update", "due", "steps", "closed", "publisher")
+
+    def __init__(self, id, tetris, seed, transport, due):
+        """
+            A game played by a client.
+
+            Parameters
+            ----------
+            id : int
+                Identifier of the session
+
+            tetris : Tetris
+                The game
+
+            seed : int
+                Seed of the game
+
+            transport : asyncio.Transport
+                Connection with the client
+
+            due : float
+                Time of the first step of the game, in milliseconds
+        """
+        self.id = id
+        self.tetris = tetris
+        self.seed = seed
+        self.transport = transport
+        self.inputs = bytearray()  # Inputs received since the last tick
+        self.fall_delay = FALL_DELAY_START
+        self.score_at_last_delay_update = 0
+        self.due = due
+        self.steps = 0
+        self.closed = False
+        self.publisher = None  # Created when the first spectator arrives
+
+
+class _SessionProtocol(asyncio.Protocol):
+    """
+        Connection of a client, it forwards the events to the server.
+    """
+    def __init__(self, server):
+        self._server = server
+        self._session = None
+
+    def connection_made(self, transport):
+        self._session = self._server._openSession(transport)
+
+    def data_received(self, data):
+        self._server._receive(self._session, data)
+
+    def connection_lost(self, exc):
+        self._server._closeSession(self._session)
+
+
+class _SpectatorProtocol(asyncio.Protocol):
+    """
+        Connection of a spectator, it reads the id of the session to watch.
+    """
+    def __init__(self, server):
+        self._server = server
+        self._transport = None
+        self._buffer = b""
+        self._session = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data):
+        if self._session is not None:
+            return
+        self._buffer = self._buffer + data
+        if len(self._buffer) >= WATCH.size:
+            self._session = self._server._watch(WATCH.unpack_from(self._buffer)[0], self._transport)
+
+    def connection_lost(self, exc):
+        if self._session is not None and self._session.publisher is not None:
+            self._session.publisher.unsubscribe(self._transport)
+
+
+class GameServer:
+    def __init__(self, width, height, engine=Tetris, tick_rate=60, seed=None, profiler=None):
+        """
+            Hosts a game for each connected client.
+            All the games are updated by a single loop that runs at a fixed rate:
+            at each tick the inputs received since the previous tick are applied, the games whose fall delay is elapsed
+            go to their next step, then the new state is sent to the clients of the changed games.
+            The games start when their clients connect, so their steps are spread over different ticks.
+            When the inputs and the steps of a tick do not fit in its budget (see TICK_BUDGET), the remaining ones
+            are run by the next ticks.
+            The changes of the games are also sent to their spectators, if any (see startSpectators).
+
+            Parameters
+            ----------
+            width, height : int
+                Size of the grids
+
+            engine : class, optional
+                The engine of the games, Tetris or one of its subclasses
+
+            tick_rate : int, optional
+                Ticks per second
+
+            seed : int, optional
+                Seed of the generator of the seeds of the games
+
+            profiler : Profiler, optional
+                Records the duration of the ticks and of their phases, a new one if None
+        """
+        self.width = width
+        self.height = height
+        self.engine = engine
+        self.tick_delay = 1000 / tick_rate
+        self.profiler = profiler if profiler is not None else Profiler()
+
+        self._rng = random.Random(seed)
+        self._sessions = {}
+        self._next_id = 0
+        self._pending = []  # Sessions with inputs to apply in the next tick
+        self._due = []      # Heap of (time of the next step, id, session)
+        self._server = None
+        self._spectator_server = None
+        self._running = False
+
+        self.ticks = 0
+        self.late_ticks = 0     # Ticks that took longer than the tick delay
+        self.games_over = 0
+
+    def _now(self):
+        """
+            Returns the current time of the event loop in milliseconds.
+        """
+        return asyncio.get_running_loop().time() * 1000
+
+    def _openSession(self, transport):
+        """
+            Starts the game of a new client.
+
+            Parameters
+            ----------
+            transport : asyncio.Transport
+                Connection with the client
+
+            Returns
+            -------
+            Session
+                The session of the client
+        """
+        seed = self._rng.randrange(1 << 63)
+        session = Session(self._next_id, self.engine(self.width, self.height, seed=seed), seed, transport, self._now() + FALL_DELAY_START)
+        self._next_id = self._next_id + 1
+
+        self._sessions[session.id] = session
+        heapq.heappush(self._due, (session.due, session.id, session))
+        transport.write(HELLO.pack(MSG_HELLO, self.width, self.height, seed, session.id))
+        return session
+
+    def _watch(self, id, transport):
+        """
+            Adds a spectator to a session.
+
+            Parameters
+            ----------
+            id : int
+                Id of the session
+
+            transport : asyncio.Transport
+                Connection with the spectator, it is closed if the session does not exist
+
+            Returns
+            -------
+            Session
+                The watched session, None if it does not exist
+        """
+        session = self._sessions.get(id)
+        if session is None:
+            transport.close()
+            return None
+
+        if session.publisher is None:
+            session.publisher = SpectatorPublisher(session.tetris)
+        session.publisher.subscribe(transport)
+        return session
+
+    def _receive(self, session, data):
+        """
+            Queues the inputs of a client, they are applied at the next tick.
+
+            Parameters
+            ----------
+            session : Session
+                The session of the client
+
+            data : bytes
+                The received inputs
+        """
+        if session.closed:
+            return
+        if len(session.inputs) == 0:
+            self._pending.append(session)
+        session.inputs.extend(data)
+
+    def _closeSession(self, session):
+        """
+            Removes the session of a client. Its entry in the heap of the steps is ignored when reached.
+
+            Parameters
+            ----------
+            session : Session
+                The session to remove
+        """
+        if session is None or session.closed:
+            return
+        session.closed = True
+        del self._sessions[session.id]
+        session.transport.close()
+        if session.publisher is not None:
+            session.publisher.close()
+
+    def _applyInputs(self, session):
+        """
+            Applies the inputs of a session queued since the last tick.
+
+            Parameters
+            ----------
+            session : Session
+                The session
+        """
+        for action in session.inputs[:MAX_INPUTS_PER_TICK].decode("latin-1"):
+            applyAction(session.tetris, action)
+        session.inputs.clear()
+
+    def _step(self, session, now):
+        """
+            Updates a game to its next step and schedules the following one.
+
+            Parameters
+            ----------
+            session : Session
+                The session
+
+            now : float
+                Current time in milliseconds
+
+            Returns
+            -------
+            bool
+                False if the game is over
+        """
+        tetris = session.tetris
+        if not tetris.nextStep():
+            return False
+        session.steps = session.steps + 1
+
+        # Same speed updates of the game
+        if tetris.score != session.score_at_last_delay_update and tetris.score % FALL_DELAY_SCORE_THRESHOLD == 0:
+            session.fall_delay = session.fall_delay / FALL_DELAY_DECREASE_RATE
+            session.score_at_last_delay_update = tetris.score
+
+        session.due = session.due + session.fall_delay
+        if session.due <= now:
+            # The server is late, the time is dropped instead of running the steps all at once
+            session.due = now + session.fall_delay
+        heapq.heappush(self._due, (session.due, session.id, session))
+        return True
+
+    def _send(self, session):
+        """
+            Sends the state of a game to its client.
+
+            Parameters
+            ----------
+            session : Session
+                The session
+        """
+        transport = session.transport
+        if transport.get_write_buffer_size() <= MAX_WRITE_BUFFER:
+            transport.write(STATE.pack(MSG_STATE, session.steps, session.tetris.score) + session.tetris.getCells())
+
+    def tick(self, now):
+        """
+            Runs a tick of the server: applies the queued inputs, updates the games whose step is due
+            and sends the new states.
+
+            Parameters
+            ----------
+            now : float
+                Current time in milliseconds
+        """
+        profiler = self.profiler
+        start = time.perf_counter()
+        deadline = start + self.tick_delay * TICK_BUDGET / 1000
+        inputs_deadline = start + self.tick_delay * TICK_BUDGET / 2000  # Half of the budget, so that the games do not stop
+
+        changed = {}
+        pending, self._pending = self._pending, []
+        for i in range(len(pending)):
+            if time.perf_counter() > inputs_deadline:
+                # The other sessions are the first ones of the next tick
+                self._pending = pending[i:] + self._pending
+                break
+            session = pending[i]
+            if not session.closed:
+                self._applyInputs(session)
+                changed[session.id] = session
+        profiler.record("inputs", start)
+
+        phase_start = profiler.now()
+        due = self._due
+        while len(due) > 0 and due[0][0] <= now and time.perf_counter() <= deadline:
+            session = heapq.heappop(due)[2]
+            if session.closed:
+                continue
+            if self._step(session, now):
+                changed[session.id] = session
+            else:
+                changed.pop(session.id, None)
+                session.transport.write(STATE.pack(MSG_OVER, session.steps, session.tetris.score))
+                self.games_over = self.games_over + 1
+                self._closeSession(session)
+        profiler.record("steps", phase_start)
+
+        phase_start = profiler.now()
+        for session in changed.values():
+            self._send(session)
+            if session.publisher is not None:
+                session.publisher.publish()
+        profiler.record("send", phase_start)
+
+        profiler.record("tick", start)
+        self.ticks = self.ticks + 1
+        if time.perf_counter() - start > self.tick_delay / 1000:
+            self.late_ticks = self.late_ticks + 1
+
+    async def start(self, host, port):
+        """
+            Starts accepting clients.
+
+            Parameters
+            ----------
+            host : str
+                Address to listen on
+
+            port : int
+                Port to listen on, 0 to choose a free one (see getPort)
+        """
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _SessionProtocol(self), host, port, backlog=4096)
+
+    async def startSpectators(self, host, port):
+        """
+            Starts accepting spectators.
+
+            Parameters
+            ----------
+            host : str
+                Address to listen on
+
+            port : int
+                Port to listen on, 0 to choose a free one (see getPort)
+        """
+        loop = asyncio.get_running_loop()
+        self._spectator_server = await loop.create_server(lambda: _SpectatorProtocol(self), host, port, backlog=4096)
+
+    def getPort(self, spectators=False):
+        """
+            Returns the port the server is listening on.
+
+            Parameters
+            ----------
+            spectators : bool, optional
+                If True, the port of the spectators
+
+            Returns
+            -------
+            int
+                The port
+        """
+        server = self._spectator_server if spectators else self._server
+        return server.sockets[0].getsockname()[1]
+
+    async def run(self):
+        """
+            Runs the ticks at a fixed rate until stop is called.
+            When a tick is late the following ones are not run earlier to catch up.
+        """
+        self._running = True
+        next_tick = self._now()
+        while self._running:
+            now = self._now()
+            self.tick(now)
+
+            next_tick = next_tick + self.tick_delay
+            now = self._now()
+            if next_tick < now:
+                next_tick = now
+            await asyncio.sleep((next_tick - now) / 1000)
+
+    async def stop(self):
+        """
+            Stops the ticks, closes the connections of the clients and stops accepting new ones.
+        """
+        self._running = False
+        for session in list(self._sessions.values()):
+            self._closeSession(session)
+        for server in [self._server, self._spectator_server]:
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+    def getMetrics(self):
+        """
+            Returns the metrics of the server.
+
+            Returns
+            -------
+            metrics : dict
+                Number of sessions and spectators, ticks run, late ticks and ended games,
+                bytes of the messages to the spectators (each one counted once),
+                timings of the ticks and of their phases (see Profiler.summary)
+        """
+        publishers = [session.publisher for session in self._sessions.values() if session.publisher is not None]
+        return {
+            "sessions": len(self._sessions),
+            "spectators": sum(publisher.getSpectators() for publisher in publishers),
+            "broadcast_bytes": sum(publisher.bytes for publisher in publishers),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "games_over": self.games_over,
+            "timings": self.profiler.summary(),
+        }
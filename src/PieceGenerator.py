@@ -0,0 +1,197 @@
+import copy
+import random
+from abc import ABC, abstractmethod
+from settings import BLOCKS, COLORS
+
+class PieceGenerator(ABC):
+    def __init__(self, chunk_size=64):
+        """
+            Generates the sequence of the pieces of a game.
+            Each piece is a tuple (shape, color) with the indexes of its shape in BLOCKS and of its color in COLORS.
+            Pieces are generated in chunks.
+
+            Parameters
+            ----------
+            chunk_size : int, optional
+                Number of pieces generated at once
+        """
+        self.chunk_size = chunk_size
+        self._pieces = []
+        self._index = 0
+        self._shared = False  # True if the state is shared with a clone (see clone)
+
+    @abstractmethod
+    def _generate(self):
+        """
+            Generates the next chunk of pieces.
+
+            Returns
+            -------
+            pieces : list of (int, int)
+                The new pieces
+        """
+
+    def _unshare(self):
+        """
+            Makes the state used by _generate independent from the clones of the generator.
+        """
+        pass
+
+    def clone(self):
+        """
+            Returns an independent copy of the generator, that generates the same pieces.
+            The state is shared until one of the copies has to generate a new chunk.
+
+            Returns
+            -------
+            PieceGenerator
+                The copy of the generator
+        """
+        generator = self.__class__.__new__(self.__class__)
+        generator.__dict__.update(self.__dict__)
+        self._shared = generator._shared = True
+        return generator
+
+    def next(self):
+        """
+            Returns the next piece.
+
+            Returns
+            -------
+            (int, int)
+                Indexes of the shape and of the color of the piece
+        """
+        if self._index >= len(self._pieces):
+            if self._shared:
+                self._unshare()
+                self._shared = False
+            self._pieces = self._generate()
+            self._index = 0
+
+        piece = self._pieces[self._index]
+        self._index = self._index + 1
+        return piece
+
+
+class UniformGenerator(PieceGenerator):
+    def __init__(self, seed=None, chunk_size=64):
+        """
+            Generates pieces with a random shape and color.
+
+            Parameters
+            ----------
+            seed : int, optional
+                Seed of the random generator
+
+            chunk_size : int, optional
+                Number of pieces generated at once
+        """
+        super().__init__(chunk_size)
+        self._rng = random.Random(seed)
+
+    def _unshare(self):
+        self._rng = copy.copy(self._rng)
+
+    def _generate(self):
+        pieces = []
+        for _ in range(self.chunk_size):
+            color = self._rng.randrange(len(COLORS))
+            shape = self._rng.randrange(len(BLOCKS))
+            pieces.append((shape, color))
+        return pieces
+
+
+class BagGenerator(PieceGenerator):
+    def __init__(self, seed=None, chunk_size=64):
+        """
+            Generates the shapes in bags, each one containing every shape in random order (7-bag).
+            Colors are random.
+
+            Parameters
+            ----------
+            seed : int, optional
+                Seed of the random generator
+
+            chunk_size : int, optional
+                Number of pieces generated at once, rounded up to whole bags
+        """
+        super().__init__(chunk_size)
+        self._rng = random.Random(seed)
+
+    def _unshare(self):
+        self._rng = copy.copy(self._rng)
+
+    def _generate(self):
+        pieces = []
+        for _ in range(-(-self.chunk_size // len(BLOCKS))):
+            bag = list(range(len(BLOCKS)))
+            self._rng.shuffle(bag)
+            for shape in bag:
+                pieces.append((shape, self._rng.randrange(len(COLORS))))
+        return pieces
+
+
+class SequenceGenerator(PieceGenerator):
+    def __init__(self, pieces):
+        """
+            Generates a fixed sequence of pieces, repeated when it ends.
+
+            Parameters
+            ----------
+            pieces : list of (int, int)
+                Indexes of the shape and of the color of each piece
+
+            Raises
+            ------
+            ValueError
+                If the sequence is empty or an index is not in BLOCKS or COLORS
+        """
+        if len(pieces) == 0:
+            raise ValueError("The sequence has no pieces")
+        for shape, color in pieces:
+            if not 0 <= shape < len(BLOCKS) or not 0 <= color < len(COLORS):
+                raise ValueError(f"Invalid piece {shape} {color}, the indexes must be in BLOCKS and COLORS")
+
+        super().__init__(len(pieces))
+        self._sequence = [tuple(piece) for piece in pieces]
+
+    @classmethod
+    def fromFile(cls, path):
+        """
+            Loads the sequence from a file, with a piece per line written as "shape color".
+            Empty lines and lines starting with # are ignored.
+
+            Parameters
+            ----------
+            path : str
+                Path of the file
+
+            Returns
+            -------
+            SequenceGenerator
+                The generator of the sequence
+
+            Raises
+            ------
+            ValueError
+                If a line is not a piece, or the file has no pieces (see SequenceGenerator)
+        """
+        pieces = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                shape, color = line.split()
+                pieces.append((int(shape), int(color)))
+
+        return cls(pieces)
+
+    def _generate(self):
+        return self._sequence
+
+
+GENERATORS = {
+    "uniform": UniformGenerator,
+    "bag": BagGenerator,
+}
@@ -0,0 +1,180 @@
+import json
+import time
+from collections import deque
+
+class Profiler:
+    def __init__(self, size=4096):
+        """
+            Records the duration of the phases of the game and of the calls to the instrumented methods.
+            The last size records of each name are kept.
+
+            Parameters
+            ----------
+            size : int, optional
+                Number of records kept for each name
+        """
+        self.size = size
+        self._records = {}  # For each name, the (start, duration) of its last records in seconds
+        self._counts = {}   # For each name, the total number of records
+        self._origin = time.perf_counter()
+
+    def now(self):
+        """
+            Returns the current time, to be passed to record.
+
+            Returns
+            -------
+            float
+                The current time in seconds
+        """
+        return time.perf_counter()
+
+    def record(self, name, start):
+        """
+            Records a phase that started at a given time and ends now.
+
+            Parameters
+            ----------
+            name : str
+                Name of the phase
+
+            start : float
+                Time when the phase started (see now)
+        """
+        duration = time.perf_counter() - start
+        if name not in self._records:
+            self._records[name] = deque(maxlen=self.size)
+            self._counts[name] = 0
+        self._records[name].append((start, duration))
+        self._counts[name] = self._counts[name] + 1
+
+    def _wrap(self, name, method):
+        """
+            Returns a function that calls a method and records its duration.
+        """
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, start)
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def instrument(self, obj, names):
+        """
+            Records the calls to some methods of an object.
+            The class of the object is replaced by a subclass with the instrumented methods,
+            so the other objects (and the object itself when not instrumented) have no overhead.
+            The clones of the object are instrumented too.
+
+            Parameters
+            ----------
+            obj : object
+                The object to instrument
+
+            names : list of str
+                Names of the methods, recorded as "ClassName.method"
+        """
+        cls = obj.__class__
+        methods = {}
+        for name in names:
+            methods[name] = self._wrap(f"{cls.__name__}.{name}", getattr(cls, name))
+        methods["_profiled_class"] = cls
+        methods["__module__"] = cls.__module__
+
+        obj.__class__ = type(cls.__name__, (cls,), methods)
+
+    def uninstrument(self, obj):
+        """
+            Stops recording the calls to the methods of an object (see instrument).
+
+            Parameters
+            ----------
+            obj : object
+                The instrumented object
+        """
+        if "_profiled_class" in obj.__class__.__dict__:
+            obj.__class__ = obj.__class__._profiled_class
+
+    def _percentile(self, durations, percentile):
+        """
+            Returns a percentile of sorted durations (nearest rank).
+        """
+        return durations[min(len(durations)-1, round(percentile / 100 * (len(durations)-1)))]
+
+    def summary(self):
+        """
+            Returns the statistics of the recorded phases. The durations are computed on the kept records.
+
+            Returns
+            -------
+            summary : dict
+                For each name, the total count and the mean, p50, p99 and max duration in milliseconds
+        """
+        summary = {}
+        for name, records in self._records.items():
+            durations = sorted(duration for _, duration in records)
+            summary[name] = {
+                "count": self._counts[name],
+                "mean_ms": sum(durations) / len(durations) * 1000,
+                "p50_ms": self._percentile(durations, 50) * 1000,
+                "p99_ms": self._percentile(durations, 99) * 1000,
+                "max_ms": durations[-1] * 1000,
+            }
+        return summary
+
+    def saveJSON(self, path):
+        """
+            Writes the statistics of the recorded phases in a JSON file (see summary).
+
+            Parameters
+            ----------
+            path : str
+                Path of the file
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def saveChromeTrace(self, path):
+        """
+            Writes the kept records in the Chrome trace format, that can be opened with chrome://tracing or Perfetto.
+
+            Parameters
+            ----------
+            path : str
+                Path of the file
+        """
+        events = []
+        for name, records in self._records.items():
+            for start, duration in records:
+                events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": 0,
+                    "tid": 0,
+                })
+        events.sort(key=lambda event: event["ts"])
+
+        with open(path, "w") as f:
+            json.dump({ "traceEvents": events, "displayTimeUnit": "ms" }, f)
+
+
+class NullProfiler:
+    """
+        Profiler that records nothing, used when profiling is disabled.
+    """
+    def now(self):
+        return 0
+
+    def record(self, name, start):
+        pass
+
+    def instrument(self, obj, names):
+        pass
+
+    def uninstrument(self, obj):
+        pass
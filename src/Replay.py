@@ -0,0 +1,224 @@
+import struct
+import zlib
+from PieceGenerator import GENERATORS
+from sim import ENGINES, ACTION_KEYS, applyAction
+
+# Header of a replay: magic, version, width, height, seed, index of the generator in GENERATORS
+HEADER = struct.Struct("<4sBHHqB")
+MAGIC = b"TTRP"
+VERSION = 1
+
+# Each event is a byte with the code of the action in the lowest bits and the number of repetitions in the others.
+# The code 0 is a game tick (nextStep), the other codes are the inputs in sim.ACTION_KEYS
+TICK = 0
+CODE_BITS = 3
+MAX_REPEAT = (1 << (8 - CODE_BITS)) - 1
+
+READ_SIZE = 1 << 16
+
+class ReplayRecorder:
+    def __init__(self, file, width, height, seed, generator="uniform"):
+        """
+            Records a game as the seed and the stream of the inputs and of the ticks applied to it.
+            Consecutive equal events are stored once with their count, and the stream is compressed while it is written.
+
+            Parameters
+            ----------
+            file : binary file
+                File where the replay is written, it is closed by close
+
+            width, height : int
+                Size of the grid
+
+            seed : int
+                Seed of the game
+
+            generator : str, optional
+                The piece generator of the game, one of the keys of PieceGenerator.GENERATORS
+        """
+        self._file = file
+        self._compressor = zlib.compressobj(9)
+        self._code = None
+        self._count = 0
+
+        self._file.write(HEADER.pack(MAGIC, VERSION, width, height, seed, list(GENERATORS).index(generator)))
+
+    @classmethod
+    def create(cls, path, width, height, seed, generator="uniform"):
+        """
+            Creates a recorder that writes a file.
+
+            Parameters
+            ----------
+            path : str
+                Path of the file
+
+            width, height, seed, generator
+                See ReplayRecorder
+
+            Returns
+            -------
+            ReplayRecorder
+                The recorder
+        """
+        return cls(open(path, "wb"), width, height, seed, generator)
+
+    def _add(self, code):
+        """
+            Adds an event to the stream.
+
+            Parameters
+            ----------
+            code : int
+                Code of the event
+        """
+        if code == self._code and self._count < MAX_REPEAT:
+            self._count = self._count + 1
+            return
+
+        self._flush()
+        self._code = code
+        self._count = 1
+
+    def _flush(self):
+        """
+            Writes the pending events.
+        """
+        if self._code is not None:
+            self._file.write(self._compressor.compress(bytes([(self._count << CODE_BITS) | self._code])))
+            self._code = None
+
+    def action(self, action):
+        """
+            Records an input.
+
+            Parameters
+            ----------
+            action : str
+                One of the keys in sim.ACTION_KEYS, "." is ignored
+        """
+        code = ACTION_KEYS.index(action)
+        if code != TICK:
+            self._add(code)
+
+    def tick(self):
+        """
+            Records a game tick.
+        """
+        self._add(TICK)
+
+    def close(self):
+        """
+            Writes the pending events and closes the file.
+        """
+        self._flush()
+        self._file.write(self._compressor.flush())
+        self._file.close()
+
+
+class ReplayPlayer:
+    def __init__(self, file):
+        """
+            Reads a replay written by ReplayRecorder, the events are decompressed while they are read.
+
+            Parameters
+            ----------
+            file : binary file
+                The replay
+        """
+        self._file = file
+
+        magic, version, self.width, self.height, self.seed, generator = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay or unsupported version")
+        self.generator = list(GENERATORS)[generator]
+
+    @classmethod
+    def open(cls, path):
+        """
+            Creates a player that reads a file.
+
+            Parameters
+            ----------
+            path : str
+                Path of the file
+
+            Returns
+            -------
+            ReplayPlayer
+                The player
+        """
+        return cls(open(path, "rb"))
+
+    def createGame(self, engine="list"):
+        """
+            Creates the recorded game, before any event.
+
+            Parameters
+            ----------
+            engine : str, optional
+                The engine to use, one of the keys of sim.ENGINES
+
+            Returns
+            -------
+            Tetris
+                The game
+        """
+        return ENGINES[engine](self.width, self.height, generator=GENERATORS[self.generator](self.seed))
+
+    def events(self):
+        """
+            Reads the events of the replay.
+
+            Returns
+            -------
+            events : iterator of (str, int)
+                Each event and how many times it is repeated.
+                The event is one of the keys in sim.ACTION_KEYS, where "." is a game tick.
+        """
+        decompressor = zlib.decompressobj()
+        while True:
+            chunk = self._file.read(READ_SIZE)
+            if len(chunk) == 0:
+                break
+            for event in decompressor.decompress(chunk):
+                yield ACTION_KEYS[event & ((1 << CODE_BITS) - 1)], event >> CODE_BITS
+        for event in decompressor.flush():
+            yield ACTION_KEYS[event & ((1 << CODE_BITS) - 1)], event >> CODE_BITS
+
+    def play(self, tetris, on_tick=None):
+        """
+            Applies the events of the replay to a game, as fast as possible, until the game is over.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game, as created by createGame
+
+            on_tick : callable, optional
+                Called with the game after each tick
+
+            Returns
+            -------
+            ticks : int
+                The number of ticks played
+        """
+        ticks = 0
+        for action, count in self.events():
+            for _ in range(count):
+                if action == ACTION_KEYS[TICK]:
+                    running = tetris.nextStep()
+                    ticks = ticks + 1
+                    if on_tick is not None:
+                        on_tick(tetris)
+                    if not running:
+                        return ticks
+                else:
+                    applyAction(tetris, action)
+        return ticks
+
+    def close(self):
+        """
+            Closes the file.
+        """
+        self._file.close()
@@ -0,0 +1,94 @@
+import time
+from collections import deque
+
+class Scheduler:
+    def __init__(self, tick_delay, max_ticks=5, stats_size=120, clock=None):
+        """
+            Fixed timestep scheduler.
+            Tells how many ticks of the game have to run to keep a fixed rate, independently from how often it is updated.
+
+            Parameters
+            ----------
+            tick_delay : float
+                Milliseconds between two ticks
+
+            max_ticks : int, optional
+                Maximum number of ticks run by a single update.
+                After a very slow frame the exceeding time is dropped, so that the game slows down instead of freezing.
+
+            stats_size : int, optional
+                Number of frames used for the timing statistics
+
+            clock : callable, optional
+                Returns the current time in milliseconds
+        """
+        self.tick_delay = tick_delay
+        self.max_ticks = max_ticks
+        self._clock = clock if clock is not None else (lambda: time.perf_counter() * 1000)
+
+        self._accumulator = 0
+        self._prev_time = None
+
+        self.frames = 0
+        self.ticks = 0
+        self._frame_times = deque(maxlen=stats_size)
+
+    def update(self):
+        """
+            Updates the scheduler with the time elapsed since the last update. It should be called once per frame.
+
+            Returns
+            -------
+            ticks : int
+                The number of ticks to run
+        """
+        now = self._clock()
+        if self._prev_time is None:
+            self._prev_time = now
+        elapsed = now - self._prev_time
+        self._prev_time = now
+
+        self.frames = self.frames + 1
+        self._frame_times.append(elapsed)
+
+        self._accumulator = self._accumulator + elapsed
+        ticks = int(self._accumulator // self.tick_delay)
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+            self._accumulator = 0
+        else:
+            self._accumulator = self._accumulator - ticks * self.tick_delay
+
+        self.ticks = self.ticks + ticks
+        return ticks
+
+    def getInterpolation(self):
+        """
+            Tells how far the game is between the last tick and the next one, to optionally interpolate the rendering.
+
+            Returns
+            -------
+            float
+                Value in [0, 1), 0 when a tick has just run
+        """
+        return min(self._accumulator / self.tick_delay, 1)
+
+    def getStats(self):
+        """
+            Returns the timing statistics of the last frames.
+
+            Returns
+            -------
+            stats : dict
+                Total frames and ticks, frames per second, average and maximum frame time in milliseconds
+        """
+        frame_times = list(self._frame_times)
+        average = sum(frame_times) / len(frame_times) if len(frame_times) > 0 else 0
+
+        return {
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "fps": 1000 / average if average > 0 else 0,
+            "frame_ms_avg": average,
+            "frame_ms_max": max(frame_times, default=0),
+        }
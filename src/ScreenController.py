@@ -1,4 +1,8 @@
 from settings import *
+from collections import OrderedDict
+
+# Maximum number of rendered texts kept in memory
+TEXT_CACHE_SIZE = 64
 
 class ScreenController:
     def __init__(self, pygame):
@@ -11,36 +15,67 @@ class ScreenController:
         # The x coordinate where the grid ends and anything else can be rendered without overlapping
         self._GRID_END_X = WIDTH*(CELL_SIZE-1) + 1
 
-    def _drawSquare(self, x, y, color, texture=False):
+        # Colors of the grid's cells as currently on screen (None for the empty cells)
+        self._rendered_grid = [[None for x in range(WIDTH)] for y in range(HEIGHT)]
+        self._rendered_next_block = None
+        self._rendered_score = None
+
+        # Areas of the screen that changed since the last update
+        self._dirty_rects = []
+
+        # Fonts indexed by size and rendered texts indexed by (text, size, color), from the least recently used
+        self._fonts = {}
+        self._texts = OrderedDict()
+
+        # Pre-rendered squares, indexed by (color, texture)
+        self._sprites = {}
+        for color in COLORS:
+            self._getSprite(color, True)
+        self._getSprite(EMPTY_COLOR, False)
+
+        # Static part of the user interface, drawn at once by initUI
+        self._background = self._buildBackground()
+
+    def _getSprite(self, color, texture=False):
         """
-            Draws a square at a specific position. Does not render on screen.
+            Returns the image of a square. The image is created only the first time.
 
             Parameters
             ----------
-            x, y : int
-                Coordinates of the cell
-
             color : Tuple (int, int, int)
-                RGB color of the cell
-            
+                RGB color of the square
+
             texture : bool
-                If True the square will be drawn with a more complex texture
+                If True the square is drawn with a more complex texture
+
+            Returns
+            -------
+            Surface
+                The image of the square
         """
-        if texture:
-            color_offset = 15
-            darker_color  = [x-color_offset if x > color_offset     else x for x in color]
-            lighter_color = [x+color_offset if x < 255-color_offset else x for x in color]
-            self.pygame.draw.rect(self._screen, lighter_color, (x, y, CELL_SIZE, CELL_SIZE))        # Top and left color
-            self.pygame.draw.rect(self._screen, darker_color, (x+5, y+5, CELL_SIZE-5, CELL_SIZE-5)) # Bottom and right color
-            self.pygame.draw.rect(self._screen, color, (x+5, y+5, CELL_SIZE-10, CELL_SIZE-10))      # Main color
-        else:
-            self.pygame.draw.rect(self._screen, color, (x, y, CELL_SIZE, CELL_SIZE))
+        key = (tuple(color), texture)
+        if key not in self._sprites:
+            sprite = self.pygame.Surface((CELL_SIZE, CELL_SIZE))
+
+            if texture:
+                color_offset = 15
+                darker_color  = [x-color_offset if x > color_offset     else x for x in color]
+                lighter_color = [x+color_offset if x < 255-color_offset else x for x in color]
+                self.pygame.draw.rect(sprite, lighter_color, (0, 0, CELL_SIZE, CELL_SIZE))        # Top and left color
+                self.pygame.draw.rect(sprite, darker_color, (5, 5, CELL_SIZE-5, CELL_SIZE-5))     # Bottom and right color
+                self.pygame.draw.rect(sprite, color, (5, 5, CELL_SIZE-10, CELL_SIZE-10))          # Main color
+            else:
+                self.pygame.draw.rect(sprite, color, (0, 0, CELL_SIZE, CELL_SIZE))
+
+            self.pygame.draw.rect(sprite, BORDER_COLOR, (0, 0, CELL_SIZE, CELL_SIZE), width=1, border_radius=1)
 
-        self.pygame.draw.rect(self._screen, BORDER_COLOR, (x, y, CELL_SIZE, CELL_SIZE), width=1, border_radius=1)
+            self._sprites[key] = sprite.convert(self._screen)
 
-    def _drawCell(self, x, y, color, solid=False):
+        return self._sprites[key]
+
+    def _drawSquare(self, x, y, color, texture=False):
         """
-            Draws the cell of a specific position of the game grid. Does not render on screen.
+            Draws a square at a specific position. Does not render on screen.
 
             Parameters
             ----------
@@ -49,50 +84,121 @@ class ScreenController:
 
             color : Tuple (int, int, int)
                 RGB color of the cell
+            
+            texture : bool
+                If True the square will be drawn with a more complex texture
+        """
+        self._screen.blit(self._getSprite(color, texture), (x, y))
 
-            solid : bool
-                Specify if the block is solid
+    def _buildBackground(self):
+        """
+            Draws the parts of the user interface that do not change: the empty grid and the area of the next block.
+
+            Returns
+            -------
+            Surface
+                The image of the screen without the score and the blocks
         """
+        background = self.pygame.Surface((self._screen_width, self._screen_height)).convert(self._screen)
+        background.fill(BACKGROUND_COLOR)
+
         cell_distance = CELL_SIZE - 1
-        self._drawSquare(x*cell_distance, y*cell_distance, color, solid)
+        empty_sprite = self._getSprite(EMPTY_COLOR)
+        background.blits([(empty_sprite, (x*cell_distance, y*cell_distance)) for y in range(HEIGHT) for x in range(WIDTH)], doreturn=False)
+
+        self._initNextBlock(background)
+
+        return background
 
     def initUI(self):
         """
             Initializes and renders the user interface.
         """
-        self._screen.fill(BACKGROUND_COLOR)
+        self._screen.blit(self._background, (0, 0))
 
-        # Score 
+        # Score
+        self._rendered_score = None
         self.updateScore(0)
 
-        # Grid
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                self._drawCell(x, y, EMPTY_COLOR)
-
-        self._initNextBlock()
-
+        self._rendered_grid = [[None for x in range(WIDTH)] for y in range(HEIGHT)]
+        self._rendered_next_block = None
+        self._dirty_rects = []
         self.pygame.display.update()
 
     def renderGrid(self, grid):
         """
-            Renders the board.
+            Draws the board. Only the cells changed since the last call are drawn.
+            Does not render on screen (see updateScreen).
 
             Parameters
             ----------
             Grid : matrix
                 The current state of the board
         """
+        cell_distance = CELL_SIZE - 1
+        empty_sprite = self._getSprite(EMPTY_COLOR)
+        changed_cells = []
+
         for y in range(HEIGHT):
+            rendered_row = self._rendered_grid[y]
             for x in range(WIDTH):
-                if grid[y][x] is not None:
-                    self._drawCell(x, y, grid[y][x].color, solid=True)
-                else:
-                    self._drawCell(x, y, EMPTY_COLOR)
-                
-        self.pygame.display.update()
+                color = grid[y][x].color if grid[y][x] is not None else None
+                if color == rendered_row[x]:
+                    continue
+
+                sprite = self._getSprite(color, True) if color is not None else empty_sprite
+                changed_cells.append((sprite, (x*cell_distance, y*cell_distance)))
+                rendered_row[x] = color
 
-    def _centerText(self, text, font_size, text_color, background_color, position, size):
+        # Cells are drawn in the same order of a full redraw, so that the overlapping borders look the same
+        self._screen.blits(changed_cells, doreturn=False)
+        for _, position in changed_cells:
+            self._dirty_rects.append(self.pygame.Rect(position, (CELL_SIZE, CELL_SIZE)))
+
+    def updateScreen(self):
+        """
+            Renders on screen the areas changed since the last update.
+        """
+        if len(self._dirty_rects) > 0:
+            self.pygame.display.update(self._dirty_rects)
+            self._dirty_rects = []
+
+    def _renderText(self, text, font_size, text_color):
+        """
+            Returns the image of a text. The last TEXT_CACHE_SIZE images are cached.
+
+            Parameters
+            ----------
+                text : String
+                    Text to render
+
+                font_size : int
+                    Font size
+
+                text_color : (int, int, int)
+                    RGB color for the text
+
+            Returns
+            -------
+            Surface
+                The image of the text
+        """
+        key = (text, font_size, tuple(text_color))
+        if key in self._texts:
+            self._texts.move_to_end(key)
+            return self._texts[key]
+
+        if font_size not in self._fonts:
+            self._fonts[font_size] = self.pygame.font.Font(self.pygame.font.get_default_font(), font_size)
+
+        image = self._fonts[font_size].render(text, True, text_color)
+        self._texts[key] = image
+        if len(self._texts) > TEXT_CACHE_SIZE:
+            self._texts.popitem(last=False)
+
+        return image
+
+    def _centerText(self, text, font_size, text_color, background_color, position, size, surface=None):
         """
             Renders the text centered in a rectangle container.
 
@@ -112,24 +218,33 @@ class ScreenController:
 
                 size : (int, int)
                     (width, height) for the rectangle
+
+                surface : Surface, optional
+                    Where the text is drawn, the screen if None
         """
-        font = self.pygame.font.Font(self.pygame.font.get_default_font(), font_size)
-        container = self.pygame.draw.rect(self._screen, background_color, (position[0], position[1], size[0], size[1]))
-        text = font.render(text, True, text_color)
+        surface = surface if surface is not None else self._screen
+        container = self.pygame.draw.rect(surface, background_color, (position[0], position[1], size[0], size[1]))
+        text = self._renderText(text, font_size, text_color)
         rect = text.get_rect()
         rect.center = container.center
-        self._screen.blit(text, rect)
+        surface.blit(text, rect)
+
+        return container
 
     def updateScore(self, score):
         """
-            Updates the score.
+            Updates the score, if it changed since the last call. Does not render on screen (see updateScreen).
 
             Parameters
             ----------
             score : int
                 The score to show
         """
-        self._centerText(
+        if score == self._rendered_score:
+            return
+        self._rendered_score = score
+
+        rect = self._centerText(
             text = f"{score*100}",
             font_size = 30,
             text_color = SCORE_COLOR, 
@@ -137,6 +252,27 @@ class ScreenController:
             position = (self._GRID_END_X, 10), 
             size = (200, 50)
         )
+        self._dirty_rects.append(rect)
+
+    def _getNextBlockCellPosition(self, x, y):
+        """
+            Returns the position on screen of a cell of the next block grid.
+
+            Parameters
+            ----------
+            x, y : int
+                Coordinates of the cell
+
+            Returns
+            -------
+            (int, int)
+                Coordinates of the top-left corner of the cell on screen
+        """
+        start_x = self._GRID_END_X + 75
+        start_y = 120
+        shift = (CELL_SIZE - 1)
+
+        return start_x + (x-1)*shift, start_y + y*shift
 
     def _drawNextBlockCell(self, x, y, color, solid=False):
         """
@@ -153,16 +289,20 @@ class ScreenController:
             solid : bool
                 Specify if the block is solid
         """
-        start_x = self._GRID_END_X + 75
-        start_y = 120
-        shift = (CELL_SIZE - 1)
+        position = self._getNextBlockCellPosition(x, y)
+        self._drawSquare(position[0], position[1], color, solid)
 
-        self._drawSquare(start_x + (x-1)*shift, start_y + y*shift, color, solid)
+        return self.pygame.Rect(position, (CELL_SIZE, CELL_SIZE))
 
 
-    def _initNextBlock(self):
+    def _initNextBlock(self, surface):
         """
-            Initialize the area to display the next block.
+            Draws the area to display the next block.
+
+            Parameters
+            ----------
+            surface : Surface
+                Where the area is drawn
         """
         self._centerText(
             text = f"Next",
@@ -170,35 +310,38 @@ class ScreenController:
             text_color = (0, 0, 0),
             background_color = BACKGROUND_COLOR,
             position = (self._GRID_END_X, 80),
-            size = (200, 50)
+            size = (200, 50),
+            surface = surface
         )
 
         # 3x4 grid to display the next block
-        for x in range(0, 4):
-            for y in range(0, 3):
-                self._drawNextBlockCell(x, y, EMPTY_COLOR)
+        empty_sprite = self._getSprite(EMPTY_COLOR)
+        surface.blits([(empty_sprite, self._getNextBlockCellPosition(x, y)) for x in range(0, 4) for y in range(0, 3)], doreturn=False)
 
     def renderNextBlock(self, block):
         """
-            Renders the next block in the UI
+            Draws the next block in the UI, if it changed since the last call.
+            Does not render on screen (see updateScreen).
 
             Parameters
             ----------
             block : Block
                 The block to render
         """
+        if block is self._rendered_next_block:
+            return
+        self._rendered_next_block = block
+
         # Cleares the previous block
         for x in range(0, 4):
             for y in range(0, 3):
-                self._drawNextBlockCell(x, y, EMPTY_COLOR)
+                self._dirty_rects.append(self._drawNextBlockCell(x, y, EMPTY_COLOR))
 
         for y in range(block.height):
             for x in range(block.width):
-                if block.shape[y][x]:
+                if block.isSolid(x, y):
                     self._drawNextBlockCell(x, y, block.color, solid=True)
 
-        self.pygame.display.update()
-
     def gameOver(self):
         """
             Renders the game over screen
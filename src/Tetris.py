@@ -1,18 +1,108 @@
-from Block import Block
+import random
+from collections import namedtuple, OrderedDict
+from itertools import chain
+from settings import COLORS
+from Block import Block, PROFILES, WIDTHS
+from PieceGenerator import UniformGenerator
+
+PLACEMENTS_CACHE_SIZE = 4096
+
+# Value of the cells of each color in the observation (0 for the empty cells)
+COLOR_CODES = {color: i+1 for i, color in enumerate(COLORS)}
+
+# Actions of step, in the same order of sim.ACTION_KEYS: nothing, left, right, bottom, counterclockwise and clockwise rotation
+ACTIONS = 6
+
+# Seed of the keys of the Zobrist hash of the grid (see getHash), so that the hashes are the same in every process
+ZOBRIST_SEED = 0x7E7215
+
+_zobrist_keys = {}
+
+def _getZobristKeys(width, height):
+    """
+        Returns the keys of the Zobrist hash of a grid, they are generated once for each size.
+
+        Returns
+        -------
+        cells : list of int
+            64 bit key of each occupied cell, row by row
+
+        right, down : list of int
+            64 bit key of each cell that belongs to the same block of the cell on its right/below it
+
+        blocks : dict
+            Cache of the hashes of the blocks, for each (shape, x, y) (see Tetris._getBlockHash)
+    """
+    if (width, height) not in _zobrist_keys:
+        rng = random.Random(f"{ZOBRIST_SEED}/{width}x{height}")
+        cells = [rng.getrandbits(64) for i in range(width * height)]
+        right = [rng.getrandbits(64) for i in range(width * height)]
+        down = [rng.getrandbits(64) for i in range(width * height)]
+        _zobrist_keys[(width, height)] = (cells, right, down, {})
+    return _zobrist_keys[(width, height)]
 
 class OverlapError(Exception):
     pass
 
+# Immutable state of a game (see Tetris.snapshot).
+# cells contains a packed row for each row of the grid, with the index in blocks+1 of the block of each cell (0 for the empty cells).
+# current is the index+1 of the current block (0 if there is not a current block)
+Snapshot = namedtuple("Snapshot", [
+    "cells", "blocks", "current", "next_block", "score",
+    "row_counts", "column_tops", "changed_rows", "rows", "colors", "hash", "game_over", "generator"
+])
+
 class Tetris:
-    def __init__(self, width, height):
+    def __init__(self, width, height, seed=None, generator=None):
+        """
+            Initializes an empty game.
+
+            Parameters
+            ----------
+            width, height : int
+                Size of the grid
+
+            seed : int, optional
+                Seed of the default piece generator.
+                Games with the same seed and the same inputs are identical.
+
+            generator : PieceGenerator, optional
+                Generator of the pieces of the game, by default a UniformGenerator with the given seed
+        """
         self.width = width
         self.height = height
-        self.grid = [[None for x in range(width)] for y in range(height)]
+        self._cells = bytearray(width * height)  # Color code of each cell, row by row (see COLOR_CODES and getObservation)
+        self._observation = None
+        self._zobrist_keys = _getZobristKeys(width, height)
+        self._placements = OrderedDict()  # Cache of the placements (see enumeratePlacements), shared with the clones
+
+        self._newGame(seed, generator)
+
+    def _newGame(self, seed, generator):
+        """
+            Starts a new game on an empty grid.
+
+            Parameters
+            ----------
+            seed, generator
+                See Tetris
+        """
+        self.grid = [[None for x in range(self.width)] for y in range(self.height)]
+        self._row_counts = [0 for y in range(self.height)]            # Number of occupied cells of each row
+        self._column_tops = [self.height for x in range(self.width)]  # Row of the highest occupied cell of each column (height if empty)
+        self._changed_rows = set()                                    # Rows where a cell has been occupied since the last check for full rows
+        self._modified_rows = set(range(self.height))                 # Rows where a cell has changed since the last takeModifiedRows
+        self._shared_rows = [False for y in range(self.height)]       # Rows of the grid shared with a clone (see clone)
+        self._owner = object()                                        # Token of the blocks that can be modified by this game (see clone)
+        self._cells[:] = bytes(len(self._cells))
+        self._hash = 0  # Zobrist hash of the grid (see getHash)
+        self._generator = generator if generator is not None else UniformGenerator(seed)
 
         self._current_block = None  # Contains the block controlled by the player
         self.next_block = self._generateBlock()
 
         self.score = 0
+        self._game_over = False  # Set when a new block does not fit, the game is not updated anymore
 
 
     def _canFall(self, block):
@@ -35,15 +125,400 @@ class Tetris:
             return False
 
         # Checks the bottom of the block
-        for coord in block.getBottomCoords():
-            if self.grid[coord[1]][coord[0]] is not None:
+        for x, y in block.getBottomProfile():
+            if self.grid[block.y + y][block.x + x] is not None:
                 return False
 
         return True
 
+    def _setCell(self, x, y, block):
+        """
+            Occupies an empty cell of the grid.
+
+            Parameters
+            ----------
+            x, y : int
+                Coordinates of the cell
+
+            block : Block
+                The block that owns the cell
+        """
+        if self._shared_rows[y]:
+            self._ownRow(y)
+        self.grid[y][x] = block
+        self._cells[y*self.width + x] = COLOR_CODES[block.color]
+        self._row_counts[y] = self._row_counts[y] + 1
+        if y < self._column_tops[x]:
+            self._column_tops[x] = y
+        self._changed_rows.add(y)
+        self._modified_rows.add(y)
+
+    def _clearCell(self, x, y):
+        """
+            Empties an occupied cell of the grid.
+
+            Parameters
+            ----------
+            x, y : int
+                Coordinates of the cell
+        """
+        if self._shared_rows[y]:
+            self._ownRow(y)
+        self.grid[y][x] = None
+        self._cells[y*self.width + x] = 0
+        self._modified_rows.add(y)
+        self._row_counts[y] = self._row_counts[y] - 1
+        if y == self._column_tops[x]:
+            # Searches for the new highest cell of the column
+            while y < self.height and self.grid[y][x] is None:
+                y = y + 1
+            self._column_tops[x] = y
+
+    def _getBlockHash(self, block):
+        """
+            Returns the part of the hash of the grid given by a block (see getHash):
+            the keys of its cells and of the links between its adjacent cells, combined with xor.
+
+            Parameters
+            ----------
+            block : Block
+                A block inside the grid
+
+            Returns
+            -------
+            int
+                The 64 bit hash of the block
+        """
+        cells, right, down, blocks = self._zobrist_keys
+        key = (block.shape, block.x, block.y)
+        if key not in blocks:
+            shape = block.shape
+            block_hash = 0
+            for y in range(len(shape)):
+                links = shape[y] & (shape[y] >> 1)                                 # Cells with a cell on their right
+                below = shape[y] & shape[y+1] if y+1 < len(shape) else 0           # Cells with a cell below them
+                for x in range(block.width):
+                    i = (block.y+y)*self.width + block.x+x
+                    if (shape[y] >> x) & 1:
+                        block_hash = block_hash ^ cells[i]
+                    if (links >> x) & 1:
+                        block_hash = block_hash ^ right[i]
+                    if (below >> x) & 1:
+                        block_hash = block_hash ^ down[i]
+            blocks[key] = block_hash
+        return blocks[key]
+
+    def _ownRow(self, y):
+        """
+            Copies a row of the grid shared with a clone, so that it can be modified.
+
+            Parameters
+            ----------
+            y : int
+                The row
+
+            Returns
+            -------
+            list
+                The row of the grid
+        """
+        if self._shared_rows[y]:
+            self.grid[y] = list(self.grid[y])
+            self._shared_rows[y] = False
+        return self.grid[y]
+
+    def _ownBlock(self, block):
+        """
+            Returns a block that can be modified by this game.
+            If the block is shared with a clone, it is replaced in the grid by a copy.
+
+            Parameters
+            ----------
+            block : Block
+                The block to modify
+
+            Returns
+            -------
+            Block
+                The block itself or its copy
+        """
+        if block.owner is self._owner:
+            return block
+
+        new_block = block.copy()
+        new_block.owner = self._owner
+        for y in range(max(0, -block.y), min(block.height, self.height - block.y)):
+            for x in range(max(0, -block.x), min(block.width, self.width - block.x)):
+                if self.grid[block.y+y][block.x+x] is block:
+                    self._ownRow(block.y+y)[block.x+x] = new_block
+        if block is self._current_block:
+            self._current_block = new_block
+
+        return new_block
+
+    def clone(self):
+        """
+            Returns an independent copy of the game.
+            The rows of the grid and the blocks are shared until one of the games modifies them (copy-on-write),
+            so cloning does not depend on the number of blocks.
+
+            Returns
+            -------
+            Tetris
+                The copy of the game
+        """
+        new_game = self.__class__.__new__(self.__class__)
+        new_game.__dict__.update(self.__dict__)
+
+        new_game.grid = list(self.grid)
+        new_game._row_counts = list(self._row_counts)
+        new_game._column_tops = list(self._column_tops)
+        new_game._changed_rows = set(self._changed_rows)
+        new_game._modified_rows = set(self._modified_rows)
+        new_game._cells = bytearray(self._cells)
+        new_game._observation = None
+        new_game._generator = self._generator.clone()
+
+        # From now on, the rows and the blocks are shared by both the games
+        self._shared_rows = [True] * self.height
+        new_game._shared_rows = list(self._shared_rows)
+        self._owner = object()
+        new_game._owner = object()
+
+        return new_game
+
+    def snapshot(self):
+        """
+            Returns the state of the game in a compact immutable form, that can be restored with restore.
+
+            Returns
+            -------
+            Snapshot
+                The state of the game
+        """
+        # Each block is identified by its position in the scan of the grid
+        index = dict.fromkeys(chain.from_iterable(self.grid))
+        index.pop(None, None)
+        if self._current_block is not None:
+            index.setdefault(self._current_block)
+        for i, block in enumerate(index):
+            index[block] = i+1
+        index[None] = 0
+
+        # Rows are packed in bytes when possible
+        pack = bytes if len(index) <= 256 else tuple
+        cells = tuple(pack(map(index.__getitem__, row)) for row in self.grid)
+
+        return Snapshot(
+            cells = cells,
+            blocks = tuple(block.getState() for block in index if block is not None),
+            current = index[self._current_block],
+            next_block = self.next_block.getState(),
+            score = self.score,
+            row_counts = tuple(self._row_counts),
+            column_tops = tuple(self._column_tops),
+            changed_rows = frozenset(self._changed_rows),
+            rows = None,
+            colors = bytes(self._cells),
+            hash = self._hash,
+            game_over = self._game_over,
+            generator = self._generator.clone()
+        )
+
+    def restore(self, snapshot):
+        """
+            Restores a state of the game. The snapshot can be restored multiple times.
+
+            Parameters
+            ----------
+            snapshot : Snapshot
+                A state of a game of the same type and size (see snapshot)
+        """
+        self._owner = object()
+        blocks = [None]
+        for state in snapshot.blocks:
+            block = Block.fromState(state)
+            block.owner = self._owner
+            blocks.append(block)
+
+        self.grid = [list(map(blocks.__getitem__, row)) for row in snapshot.cells]
+        self._shared_rows = [False for y in range(self.height)]
+        self._current_block = blocks[snapshot.current]
+        self.next_block = Block.fromState(snapshot.next_block)
+        self.next_block.owner = self._owner
+        self.score = snapshot.score
+
+        self._row_counts = list(snapshot.row_counts)
+        self._column_tops = list(snapshot.column_tops)
+        self._changed_rows = set(snapshot.changed_rows)
+        self._modified_rows = set(range(self.height))
+        self._cells[:] = snapshot.colors
+        self._hash = snapshot.hash
+        self._game_over = snapshot.game_over
+        self._generator = snapshot.generator.clone()
+
+    def getColumnHeights(self):
+        """
+            Returns the height of each column, from the bottom of the grid to its highest occupied cell.
+
+            Returns
+            -------
+            heights : list of int
+                The height of each column
+        """
+        return [self.height - top for top in self._column_tops]
+
+    def getStackTops(self, ignore_current=True):
+        """
+            Returns the row of the highest occupied cell of each column.
+
+            Parameters
+            ----------
+            ignore_current : bool, optional
+                If True, the cells of the current block are not considered
+
+            Returns
+            -------
+            tops : list of int
+                The row of the highest cell of each column (height if empty)
+        """
+        if ignore_current and self._current_block is not None:
+            return self._getStackTops(self._current_block)
+        return list(self._column_tops)
+
+    def getCurrentBlock(self):
+        """
+            Returns the block controlled by the player. It should not be modified, it can be shared with the clones of the game.
+
+            Returns
+            -------
+            Block
+                The current block, None if the previous one has been locked and the next one is not placed yet
+        """
+        return self._current_block
+
+    def getCells(self):
+        """
+            Returns the color code of each cell (see COLOR_CODES), row by row.
+            It is a read-only view of the buffer of the game, updated while the game goes on.
+
+            Returns
+            -------
+            memoryview
+                The codes of the cells, width*height bytes
+        """
+        return memoryview(self._cells).toreadonly()
+
+    def getHash(self):
+        """
+            Returns the Zobrist hash of the grid. It depends on the occupied cells and on how they are grouped in blocks
+            (the adjacent cells that belong to the same block), but not on the colors.
+            It is updated when a block is inserted, removed or split, and the keys are the same in every process (see ZOBRIST_SEED).
+
+            Returns
+            -------
+            int
+                The 64 bit hash
+        """
+        return self._hash
+
+    def takeModifiedRows(self):
+        """
+            Returns the rows where a cell has changed (see getCells) since the last call, or since the start of the game.
+
+            Returns
+            -------
+            rows : set of int
+                Indexes of the rows
+        """
+        rows = self._modified_rows
+        self._modified_rows = set()
+        return rows
+
+    def getObservation(self):
+        """
+            Returns the color code of each cell (see COLOR_CODES) as a NumPy array.
+            It is a read-only view of the buffer of the game, updated while the game goes on without copies.
+
+            Returns
+            -------
+            array of uint8
+                (height, width) array with the code of each cell, 0 for the empty cells
+        """
+        if self._observation is None:
+            import numpy as np
+            self._observation = np.frombuffer(self.getCells(), dtype=np.uint8).reshape(self.height, self.width)
+        return self._observation
+
+    def reset(self, seed=None):
+        """
+            Starts a new game, with pieces generated by a UniformGenerator.
+            The views of the cells remain valid.
+
+            Parameters
+            ----------
+            seed : int, optional
+                Seed of the piece generator
+
+            Returns
+            -------
+            array of uint8
+                The observation of the new game (see getObservation)
+        """
+        self._newGame(seed, None)
+        return self.getObservation()
+
+    def step(self, action):
+        """
+            Applies an action and updates the game to the next game cycle.
+            Once the game is over, the actions are ignored and done stays True until reset.
+
+            Parameters
+            ----------
+            action : int
+                0 : nothing
+                1 : moveLeft
+                2 : moveRight
+                3 : moveDown
+                4 : counterclockwise rotation
+                5 : clockwise rotation
+
+            Returns
+            -------
+            observation : array of uint8
+                The cells of the game (see getObservation)
+
+            reward : int
+                The number of rows cleared
+
+            done : bool
+                True if the game is over
+
+            info : dict
+                The score of the game (rows cleared since the start)
+        """
+        if self._game_over:
+            return self.getObservation(), 0, True, { "score": self.score }
+
+        score = self.score
+        if action == 1:
+            self.moveLeft()
+        elif action == 2:
+            self.moveRight()
+        elif action == 3:
+            self.moveDown()
+        elif action == 4:
+            self.rotate(clockwise=False)
+        elif action == 5:
+            self.rotate(clockwise=True)
+        done = not self.nextStep()
+
+        return self.getObservation(), self.score - score, done, { "score": self.score }
+
     def _insertBlock(self, block):
         """
             Inserts the block in the grid. The position is specified in the block object.
+            The grid is not modified if the block cannot be inserted.
 
             Parameters
             ----------
@@ -52,16 +527,17 @@ class Tetris:
 
             Raises
             -------
-            RuntimeError
+            OverlapError
                 If the new block overlaps with an existing block
         """
-        for y in range(block.height):
-            for x in range(block.width):
-                if block.shape[y][x]:
-                    if self.grid[block.y+y][block.x+x] is not None:
-                        raise OverlapError("Blocks are overlapping")
-                        
-                    self.grid[block.y+y][block.x+x] = block
+        cells = [(block.x+x, block.y+y) for y in range(block.height) for x in range(block.width) if block.isSolid(x, y)]
+        for x, y in cells:
+            if self.grid[y][x] is not None:
+                raise OverlapError("Blocks are overlapping")
+
+        for x, y in cells:
+            self._setCell(x, y, block)
+        self._hash = self._hash ^ self._getBlockHash(block)
         
     def _removeBlock(self, block):
         """
@@ -72,11 +548,75 @@ class Tetris:
             block : Block
             The block to remove in the grid
         """
+        self._hash = self._hash ^ self._getBlockHash(block)
         for y in range(block.height):
             for x in range(block.width):
                 if 0 <= block.y+y < self.height and 0 <= block.x+x < self.width:
-                    if block.shape[y][x] and self.grid[block.y+y][block.x+x] == block:
-                        self.grid[block.y+y][block.x+x] = None
+                    if block.isSolid(x, y) and self.grid[block.y+y][block.x+x] == block:
+                        self._clearCell(block.x+x, block.y+y)
+
+    def _moveBlock(self, block, x, y, rotation=None):
+        """
+            Moves a block of the grid to a new position and rotation. The block must fit in it (see fits).
+
+            Parameters
+            ----------
+            block : Block
+                The block to move
+
+            x, y : int
+                The new position of the top-left corner of the block
+
+            rotation : int, optional
+                The new rotation of the block, the current one if None
+
+            Returns
+            -------
+            Block
+                The moved block, a copy of the given one if it was shared with a clone (see _ownBlock)
+        """
+        self._removeBlock(block)
+        block = self._ownBlock(block)
+        if rotation is not None:
+            for _ in range((rotation - block.rotation) % 4):
+                block.rotate()
+        block.x, block.y = x, y
+        self._insertBlock(block)
+        return block
+
+    def fits(self, block, x, y, rotation=None):
+        """
+            Tells if a block can be placed in a position of the grid. The grid is not modified.
+            The cells taken by the block itself are considered empty.
+
+            Parameters
+            ----------
+            block : Block
+                The block to check
+
+            x, y : int
+                The position of the top-left corner of the block
+
+            rotation : int, optional
+                The rotation of the block (see Block.getShape), the current one if None
+
+            Returns
+            -------
+            bool
+                True  : if the block is inside the grid and does not overlap other blocks
+                False : otherwise
+        """
+        shape, width = block.getShape(rotation)
+        if x < 0 or y < 0 or x + width > self.width or y + len(shape) > self.height:
+            return False
+
+        for i in range(len(shape)):
+            row = self.grid[y+i]
+            for j in range(width):
+                if (shape[i] >> j) & 1 and row[x+j] is not None and row[x+j] is not block:
+                    return False
+
+        return True
 
     def _moveX(self, block, direction):
         """
@@ -100,24 +640,19 @@ class Tetris:
                 >>> _moveX(-1) represents a move to left
                 >>> _moveX(1)  represents a move to right
         """
-        old_position = block.x
         new_position = block.x + direction
 
         # Checks if it goes out of bounds
         if new_position < 0 or (new_position + block.width > self.width):
             return False
 
-        try:
-            self._removeBlock(block)
-            block.x = new_position
-            self._insertBlock(block)
-            return True
-        except OverlapError:
-            # Revert the move
-            self._removeBlock(block)
-            block.x = old_position
-            self._insertBlock(block)
-            return False
+        # Checks the cells that the block would take
+        for x, y in (block.getLeftProfile() if direction < 0 else block.getRightProfile()):
+            if self.grid[block.y + y][block.x + x] is not None:
+                return False
+
+        self._moveBlock(block, new_position, block.y)
+        return True
 
     def _moveY(self, block, direction):
         """
@@ -136,33 +671,157 @@ class Tetris:
                 True  : on success
                 False : otherwise
         """
-        self._removeBlock(block)
+        distance = min(direction, self._getFallDistance(block))
+        if distance <= 0:
+            return False
 
-        while self._canFall(block) and direction > 0:
-            block.y = block.y + 1
-            direction = direction - 1
+        self._moveBlock(block, block.x, block.y + distance)
+        return True
 
-        self._insertBlock(block)
+    def _getFallDistance(self, block):
+        """
+            Computes how many cells a block can fall in the current configuration of the grid.
+
+            Parameters
+            ----------
+            block : Block
+                The block that has to be checked
+
+            Returns
+            -------
+            distance : int
+                The number of empty cells below the block
+        """
+        # Distance from the bottom of the grid
+        distance = self.height - (block.y + block.height)
+
+        # For each column, the empty cells below the lowest solid cell of the block
+        for x, y in block.getBottomProfile():
+            x, y = block.x + x, block.y + y
+            column_distance = 0
+            while column_distance < distance and self.grid[y + column_distance][x] is None:
+                column_distance = column_distance + 1
+            distance = column_distance
+
+        return distance
     
+    def _getStackTops(self, ignored_block):
+        """
+            Returns the row of the highest occupied cell of each column, ignoring a block.
+
+            Parameters
+            ----------
+            ignored_block : Block
+                The block to ignore
+
+            Returns
+            -------
+            tops : list of int
+                The row of the highest cell of each column (height if empty)
+        """
+        tops = list(self._column_tops)
+        for x in range(max(0, ignored_block.x), min(self.width, ignored_block.x + ignored_block.width)):
+            y = tops[x]
+            while y < self.height and (self.grid[y][x] is None or self.grid[y][x] is ignored_block):
+                y = y + 1
+            tops[x] = y
+        return tops
+
+    def _searchPlacements(self, tops, piece, rotation, start_x, start_y):
+        """
+            Searches the placements of a piece that can be reached from its position with rotations and moves along the x-axis.
+            The stack is described by the top of its columns, so a piece always lands on the highest cell below it.
+
+            Parameters
+            ----------
+            tops : tuple of int
+                The row of the highest occupied cell of each column (height if empty)
+
+            piece, rotation : int
+                Indexes of the shape and of the rotation of the piece (see Block.ROTATIONS)
+
+            start_x, start_y : int
+                The position of the piece
+
+            Returns
+            -------
+            placements : tuple of tuples (int, int, int)
+                The rotation, the x and the landing y of each placement, empty if the piece does not fit in its position
+        """
+        def landing(rotation, x):
+            if x < 0 or x + WIDTHS[piece][rotation] > self.width:
+                return None
+            return min(tops[x + bx] - by for bx, by in PROFILES[piece][rotation][1])
+
+        # The piece can be in a position if it is above the stack
+        placements = {}
+        to_visit = [(rotation, start_x)]
+        while len(to_visit) > 0:
+            rotation, x = to_visit.pop()
+            if (rotation, x) in placements:
+                continue
+            y = landing(rotation, x)
+            if y is None or y < start_y:
+                continue
+
+            placements[(rotation, x)] = y
+            to_visit.extend([(rotation, x-1), (rotation, x+1), ((rotation+1) % 4, x), ((rotation-1) % 4, x)])
+
+        return tuple(sorted((rotation, x, y) for (rotation, x), y in placements.items()))
+
+    def enumeratePlacements(self):
+        """
+            Returns every placement of the current block that can be reached with rotations and moves along the x-axis,
+            followed by a move to the bottom. The grid is not modified.
+
+            Placements are computed from the height of the columns, so holes under the stack are never reachable.
+            The last PLACEMENTS_CACHE_SIZE results are cached.
+
+            Returns
+            -------
+            placements : tuple of tuples (int, int, int)
+                The rotation (see Block.ROTATIONS), the x and the landing y of each placement.
+                Empty if there is not a current block.
+        """
+        block = self._current_block
+        if block is None or block.piece is None:
+            return ()
+
+        # The result only depends on the stack and on the piece
+        key = (tuple(self._getStackTops(block)), block.piece, block.rotation, block.x, block.y)
+        if key in self._placements:
+            self._placements.move_to_end(key)
+            return self._placements[key]
+
+        placements = self._searchPlacements(key[0], *key[1:])
+        if len(placements) == 0:
+            # The block is under the stack, it can only fall
+            placements = ((block.rotation, block.x, block.y + self._getFallDistance(block)),)
+
+        self._placements[key] = placements
+        if len(self._placements) > PLACEMENTS_CACHE_SIZE:
+            self._placements.popitem(last=False)
+        return placements
+
     def moveLeft(self):
         """
             Moves the current block to left.
         """
-        if self._current_block is not None:
+        if self._current_block is not None and not self._game_over:
             self._moveX(self._current_block, -1)
 
     def moveRight(self):
         """
             Moves the current block to right.
         """
-        if self._current_block is not None:
+        if self._current_block is not None and not self._game_over:
             self._moveX(self._current_block, 1)
 
     def moveDown(self):
         """
             Moves the current block at the bottom.
         """
-        if self._current_block is not None:
+        if self._current_block is not None and not self._game_over:
             self._moveY(self._current_block, self.height)
 
     def _isFullRow(self, row):
@@ -180,10 +839,19 @@ class Tetris:
                 True  : if the row is full
                 False : otherwise
         """
+        return self._row_counts[row] == self.width
+
+    def _clearRow(self, row):
+        """
+            Empties every cell of a row, the blocks are not modified.
+
+            Parameters
+            ----------
+            row : int
+                The row to clear
+        """
         for x in range(self.width):
-            if self.grid[row][x] is None:
-                return False
-        return True
+            self._clearCell(x, row)
 
     def _resetRow(self, row):
         """
@@ -193,36 +861,74 @@ class Tetris:
             ----------
             row : int
                 The row to reset
+
+            Returns
+            -------
+            int
+                The lowest row of the blocks next to the reset row.
+                Below this row nothing is affected by the reset.
         """
+        lowest_row = row
+
         # Clears the row
         prev = None
         for x in range(self.width):
-            if self.grid[row][x] != prev:
-                self.grid[row][x].clearRow(row - self.grid[row][x].y)
-                prev = self.grid[row][x]
-            self.grid[row][x] = None
+            block = self.grid[row][x]
+            if block != prev:
+                block = self._ownBlock(block)
+                self._hash = self._hash ^ self._getBlockHash(block)
+                block.clearRow(row - block.y)
+                self._hash = self._hash ^ self._getBlockHash(block)
+                prev = block
+        self._clearRow(row)
+
+        # Handles split blocks, each block is considered once
+        near_blocks = {}
+        for j in [row-1, row+1]:
+            if 0 <= j < self.height:
+                for x in range(self.width):
+                    if self.grid[j][x] is not None:
+                        near_blocks[self.grid[j][x]] = True
+
+        for curr_block in near_blocks:
+            lowest_row = max(lowest_row, curr_block.y + curr_block.height-1)
+            if curr_block.hasEmptyRow():
+                split_blocks = curr_block.dismantle()
+
+                # Removes the original block and places the new blocks
+                self._removeBlock(curr_block)
+                for block in split_blocks:
+                    block.owner = self._owner
+                    self._insertBlock(block)
+
+        return lowest_row
+
+    def _handleGravity(self, from_row=None):
+        """
+            Handles the gravity of the board.
 
-        # Handles split blocks
-        for x in range(self.width):
-            for j in [row-1, row+1]:
-                if (0 <= j < self.height) and (self.grid[j][x] is not None):
-                    curr_block = self.grid[j][x]
-                    split_blocks = curr_block.dismantle()
-                    
-                    # Removes the original block and places the new blocks
-                    self._removeBlock(curr_block)
-                    for block in split_blocks:
-                        self._insertBlock(block)
+            Parameters
+            ----------
+            from_row : int, optional
+                Only the blocks from this row up are considered, the entire board if None
+        """
+        if from_row is None:
+            from_row = self.height-2
 
+        # A block at rest can fall only after another block has moved,
+        # so for each block it is stored the number of moves when it was last checked
+        moves = 0
+        checked = {}
 
-    def _handleGravity(self):
-        """
-            Handles the gravity of the entire board.
-        """
-        for y in range(self.height-2, -1, -1):
+        for y in range(min(from_row, self.height-2), -1, -1):
             for x in range(self.width):
-                if self.grid[y][x] is not None and self._canFall(self.grid[y][x]):
-                    self._moveY(self.grid[y][x], self.height)
+                block = self.grid[y][x]
+                if block is None or checked.get(block) == moves:
+                    continue
+
+                if self._moveY(block, self.height):
+                    moves = moves + 1
+                checked[block] = moves
 
     def rotate(self, clockwise):
         """
@@ -233,16 +939,27 @@ class Tetris:
             clockwise : bool
                 If True, performs a clockwise rotation, couterclockwise otherwise
         """
-        if self._current_block is not None:
-            self._removeBlock(self._current_block)
-            self._current_block.rotate(clockwise)
-            try:
-                self._insertBlock(self._current_block)
-            except (OverlapError, IndexError):
-                # Revert the rotation
-                self._removeBlock(self._current_block)
-                self._current_block.rotate(not clockwise)
-                self._insertBlock(self._current_block)
+        block = self._current_block
+        if block is not None and not self._game_over:
+            rotation = (block.rotation + (1 if clockwise else -1)) % 4
+            if not self.fits(block, block.x, block.y, rotation):
+                return
+
+            self._moveBlock(block, block.x, block.y, rotation)
+
+    def place(self, rotation, x, y):
+        """
+            Moves the current block to one of its placements (see enumeratePlacements), as the moves that reach it would do.
+            The block is locked by the next step.
+
+            Parameters
+            ----------
+            rotation, x, y : int
+                The rotation and the position of the placement
+        """
+        block = self._current_block
+        if block is not None and not self._game_over:
+            self._moveBlock(block, x, y, rotation)
 
     def _generateBlock(self):
         """
@@ -253,7 +970,10 @@ class Tetris:
             Block
                 The new generated block
         """
-        return Block(round(self.width / 2) - 2, 0)
+        shape, color = self._generator.next()
+        block = Block(round(self.width / 2) - 2, 0, shape, color)
+        block.owner = self._owner
+        return block
 
     def nextStep(self):
         """
@@ -262,9 +982,12 @@ class Tetris:
             Returns
             -------
             bool
-                False : if the game is over
+                False : if the game is over, also in the following calls
                 True  : otherwise
         """
+        if self._game_over:
+            return False
+
         if self._current_block is None:
             # Sets a new block and generates the next block
             self._current_block = self.next_block
@@ -272,6 +995,7 @@ class Tetris:
             try:
                 self._insertBlock(self._current_block)
             except OverlapError:
+                self._game_over = True
                 return False  # Game over
         else:
             if self._canFall(self._current_block):
@@ -281,17 +1005,19 @@ class Tetris:
 
                 # Score update
                 # The loop handles a full row that is created after the fall of other blocks
-                something_changed = True
-                while something_changed:
-                    something_changed = False
-
-                    # Checks for full rows
-                    for y in range(self.height - 1, -1, -1):
-                        if self._isFullRow(y):
-                            self._resetRow(y)
-                            self.score = self.score + 1
-                            something_changed = True
-
-                    self._handleGravity()
+                while True:
+                    # Only the rows where a block has been inserted can be full
+                    full_rows = [y for y in sorted(self._changed_rows, reverse=True) if self._isFullRow(y)]
+                    self._changed_rows.clear()
+                    if len(full_rows) == 0:
+                        break
+
+                    # Nothing can fall below the blocks affected by the reset rows
+                    lowest_row = 0
+                    for y in full_rows:
+                        lowest_row = max(lowest_row, self._resetRow(y))
+                        self.score = self.score + 1
+
+                    self._handleGravity(lowest_row)
 
         return True
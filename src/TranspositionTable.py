@@ -0,0 +1,132 @@
+import sys
+from collections import OrderedDict
+
+# Estimated bytes used by an entry besides its value: the key and the node of the table
+ENTRY_OVERHEAD = 200
+
+class TranspositionTable:
+    def __init__(self, max_entries=1 << 20, max_bytes=256 << 20, sizeof=sys.getsizeof):
+        """
+            Cache of the values computed for the positions of the games, such as their evaluation by a bot.
+            The positions are identified by the hash of the grid and by the current and the next piece (see makeKey).
+            When the table is full, the least recently used entries are removed.
+
+            Parameters
+            ----------
+            max_entries : int, optional
+                Maximum number of entries
+
+            max_bytes : int, optional
+                Maximum memory used by the entries, estimated as ENTRY_OVERHEAD plus the size of each value
+
+            sizeof : callable, optional
+                Returns the size in bytes of a value
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # For each key, its value and its size
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def makeKey(tetris):
+        """
+            Returns the key of the current position of a game.
+
+            Parameters
+            ----------
+            tetris : Tetris
+                The game
+
+            Returns
+            -------
+            tuple
+                The hash of the grid (see Tetris.getHash), the shape of the current block (None if there is not a current block)
+                and the shape of the next block
+        """
+        current = tetris.getCurrentBlock()
+        return (tetris.getHash(), current.piece if current is not None else None, tetris.next_block.piece)
+
+    def get(self, key, default=None):
+        """
+            Returns the value of a position.
+
+            Parameters
+            ----------
+            key : tuple
+                The key of the position (see makeKey)
+
+            default : optional
+                Returned if the position is not in the table
+
+            Returns
+            -------
+            The value of the position or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses = self.misses + 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits = self.hits + 1
+        return entry[0]
+
+    def put(self, key, value):
+        """
+            Stores the value of a position, replacing the previous one.
+
+            Parameters
+            ----------
+            key : tuple
+                The key of the position (see makeKey)
+
+            value
+                The value of the position
+        """
+        size = ENTRY_OVERHEAD + self._sizeof(value)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes = self.bytes - previous[1]
+
+        self._entries[key] = (value, size)
+        self.bytes = self.bytes + size
+
+        while len(self._entries) > self.max_entries or (self.bytes > self.max_bytes and len(self._entries) > 1):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes = self.bytes - evicted_size
+            self.evictions = self.evictions + 1
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+            Removes all the entries.
+        """
+        self._entries.clear()
+        self.bytes = 0
+
+    def getStats(self):
+        """
+            Returns the statistics of the table.
+
+            Returns
+            -------
+            stats : dict
+                Number of entries, estimated bytes, hits, misses and evictions
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
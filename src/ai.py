@@ -0,0 +1,92 @@
+"""
+    Plays games without a window with the beam search player, and reports the placements it evaluates per second.
+
+    Usage: python3 src/ai.py --games 10 --depth 2 --beam 8 --processes 4 --budget 0.1
+"""
+import argparse
+import time
+from settings import WIDTH, HEIGHT
+from sim import ENGINES
+from PieceGenerator import GENERATORS
+from BeamSearchPlayer import BeamSearchPlayer
+
+def playAIGame(player, seed, engine="list", generator="uniform", width=WIDTH, height=HEIGHT, max_pieces=None):
+    """
+        Plays a game with a player until it is over.
+
+        Parameters
+        ----------
+        player : BeamSearchPlayer
+            The player
+
+        seed : int
+            Seed of the pieces
+
+        engine : str, optional
+            The engine to use, one of the keys of sim.ENGINES
+
+        generator : str, optional
+            The piece generator, one of the keys of PieceGenerator.GENERATORS
+
+        width, height : int, optional
+            Size of the grid
+
+        max_pieces : int, optional
+            Maximum number of pieces placed
+
+        Returns
+        -------
+        result : dict
+            Seed, score (as displayed), lines cleared and pieces placed
+    """
+    tetris = ENGINES[engine](width, height, generator=GENERATORS[generator](seed))
+    pieces = 0
+    while max_pieces is None or pieces < max_pieces:
+        pieces = pieces + 1
+        if not player.play(tetris):
+            break
+
+    return {
+        "seed": seed,
+        "score": tetris.score * 100,
+        "lines": tetris.score,
+        "pieces": pieces,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays games of Tetris with a beam search player")
+    parser.add_argument("--games", type=int, default=1, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--depth", type=int, choices=[1, 2], default=2, help="blocks placed by the search: the current one, and the next one with 2")
+    parser.add_argument("--beam", type=int, default=8, help="games kept at each level of the search")
+    parser.add_argument("--processes", type=int, default=None, help="processes of the search, 0 to search in this process")
+    parser.add_argument("--budget", type=float, default=None, help="maximum seconds of the search of a move")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="list", help="grid engine")
+    parser.add_argument("--generator", choices=GENERATORS.keys(), default="uniform", help="piece generator")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--max-pieces", type=int, default=None, help="maximum number of pieces of each game")
+    args = parser.parse_args()
+
+    player = BeamSearchPlayer(args.depth, args.beam, args.processes, args.budget)
+    start = time.perf_counter()
+    lines, pieces = 0, 0
+    for i in range(args.games):
+        result = playAIGame(player, args.seed + i, args.engine, args.generator, args.width, args.height, args.max_pieces)
+        lines = lines + result["lines"]
+        pieces = pieces + result["pieces"]
+        print(f"Game {result['seed']}: {result['lines']} lines, {result['pieces']} pieces", flush=True)
+    seconds = time.perf_counter() - start
+    player.close()
+
+    stats = player.getStats()
+    print(f"Games:          {args.games}")
+    print(f"Pieces:         {pieces}")
+    print(f"Lines:          {lines}")
+    print(f"Time:           {seconds:.3f} s")
+    print(f"Placements:     {stats['placements']}")
+    print(f"Placements/sec: {stats['placements_per_second']:.1f}")
+    print(f"Move ms:        {stats['seconds'] / max(1, stats['moves']) * 1000:.2f}")
+
+if __name__ == "__main__":
+    main()
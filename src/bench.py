@@ -0,0 +1,374 @@
+"""
+    Benchmarks of the hot paths of the game, with seeded workloads.
+    The renderer runs with the dummy SDL video driver, so no window is opened.
+
+    Usage: python3 src/bench.py --sizes 10x20,100x200 --output bench.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from settings import WIDTH, HEIGHT, COLORS, BLOCKS
+from Block import Block
+from sim import ENGINES, RandomPolicy, applyAction, policySeed
+from BeamSearchPlayer import BeamSearchPlayer
+
+# The inputs of the random policy, moves to the bottom are more frequent to fill the board faster
+STACK_ACTIONS = ".ADQESS"
+
+def benchNextStep(engine, width, height, seed, ops):
+    """
+        Measures the steps of games played with random inputs. A new game starts when the previous one is over.
+
+        Parameters
+        ----------
+        engine : str
+            The engine to use, one of the keys of sim.ENGINES
+
+        width, height : int
+            Size of the grid
+
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of steps
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    tetris = ENGINES[engine](width, height, seed=seed)
+    policy = RandomPolicy(policySeed(seed))
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        applyAction(tetris, policy(tetris))
+        if not tetris.nextStep():
+            tetris = ENGINES[engine](width, height, seed=seed)
+    return time.perf_counter() - start
+
+def _buildStack(engine, width, height, seed):
+    """
+        Plays a game with random inputs until the stack fills half of the grid.
+
+        Returns
+        -------
+        Tetris
+            The game, just after a block has been locked
+    """
+    tetris = ENGINES[engine](width, height, seed=seed)
+    policy = RandomPolicy(policySeed(seed), STACK_ACTIONS)
+    while True:
+        applyAction(tetris, policy(tetris))
+        if not tetris.nextStep():
+            seed = seed + 1
+            tetris = ENGINES[engine](width, height, seed=seed)
+            policy = RandomPolicy(policySeed(seed), STACK_ACTIONS)
+        elif tetris.getCurrentBlock() is None and max(tetris.getColumnHeights()) >= height // 2:
+            return tetris
+
+def benchLineClear(engine, width, height, seed, ops):
+    """
+        Measures the reset of a full row and the gravity that follows it.
+        Each time a random row of the same stack is filled with single cells and cleared.
+
+        Parameters
+        ----------
+        engine : str
+            The engine to use, one of the keys of sim.ENGINES
+
+        width, height : int
+            Size of the grid
+
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of cleared rows
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    tetris = _buildStack(engine, width, height, seed)
+    snapshot = tetris.snapshot()
+    rng = random.Random(seed)
+    top = height - max(tetris.getColumnHeights())
+
+    seconds = 0
+    for _ in range(ops):
+        tetris.restore(snapshot)
+        row = rng.randrange(top, height)
+        for x in range(width):
+            if tetris.grid[row][x] is None:
+                cell = Block.fromState((x, row, COLORS[0], None, None, (1,), 1, None))
+                cell.owner = tetris._owner
+                tetris._insertBlock(cell)
+
+        start = time.perf_counter()
+        tetris._handleGravity(tetris._resetRow(row))
+        seconds = seconds + time.perf_counter() - start
+    return seconds
+
+def benchRotate(seed, ops):
+    """
+        Measures Block.rotate on random pieces.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of rotations
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    rng = random.Random(seed)
+    blocks = [Block(0, 0, rng.randrange(len(BLOCKS)), 0) for _ in range(64)]
+    clockwise = [rng.random() < 0.5 for _ in range(64)]
+
+    start = time.perf_counter()
+    for i in range(ops):
+        blocks[i % 64].rotate(clockwise[i % 64])
+    return time.perf_counter() - start
+
+def benchBottomCoords(seed, ops):
+    """
+        Measures Block.getBottomCoords on random pieces, with random rotations and positions.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of calls
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    rng = random.Random(seed)
+    blocks = [Block(rng.randrange(WIDTH), rng.randrange(HEIGHT), rng.randrange(len(BLOCKS)), 0) for _ in range(64)]
+    for block in blocks:
+        for _ in range(rng.randrange(4)):
+            block.rotate()
+
+    start = time.perf_counter()
+    for i in range(ops):
+        blocks[i % 64].getBottomCoords()
+    return time.perf_counter() - start
+
+def benchBeamSearch(engine, width, height, seed, ops):
+    """
+        Measures the moves of the beam search player (see BeamSearchPlayer), searching in this process.
+        A new game starts when the previous one is over.
+
+        Parameters
+        ----------
+        engine : str
+            The engine to use, one of the keys of sim.ENGINES
+
+        width, height : int
+            Size of the grid
+
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of moves
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    tetris = ENGINES[engine](width, height, seed=seed)
+    player = BeamSearchPlayer(depth=2, beam_width=4, processes=0)
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        if not player.play(tetris):
+            tetris = ENGINES[engine](width, height, seed=seed)
+    return time.perf_counter() - start
+
+def benchRenderGrid(seed, ops):
+    """
+        Measures the rendering of the grid of a game played with random inputs, one frame for each step.
+        The grid has the size in the settings, as the screen.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of the workload
+
+        ops : int
+            Number of frames
+
+        Returns
+        -------
+        seconds : float
+            Time spent
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from ScreenController import ScreenController
+
+    pygame.display.init()
+    pygame.font.init()
+    screen_controller = ScreenController(pygame)
+    screen_controller.initUI()
+    tetris = ENGINES["list"](WIDTH, HEIGHT, seed=seed)
+    policy = RandomPolicy(policySeed(seed))
+
+    seconds = 0
+    for _ in range(ops):
+        applyAction(tetris, policy(tetris))
+        if not tetris.nextStep():
+            tetris = ENGINES["list"](WIDTH, HEIGHT, seed=seed)
+
+        start = time.perf_counter()
+        screen_controller.renderGrid(tetris.grid)
+        screen_controller.updateScreen()
+        seconds = seconds + time.perf_counter() - start
+
+    pygame.quit()
+    return seconds
+
+def runBenchmarks(sizes, seed=0, repeat=3, scale=1, only=None):
+    """
+        Runs the benchmarks. Each one is repeated and the fastest run is kept.
+
+        Parameters
+        ----------
+        sizes : list of (int, int)
+            Sizes of the grids of the engine benchmarks
+
+        seed : int, optional
+            Seed of the workloads
+
+        repeat : int, optional
+            Number of runs of each benchmark
+
+        scale : float, optional
+            Multiplies the number of operations of each benchmark
+
+        only : str, optional
+            Only the benchmarks with this text in their name are run
+
+        Returns
+        -------
+        results : dict
+            For each benchmark, the number of operations, the seconds and the microseconds per operation
+    """
+    cases = []
+    for width, height in sizes:
+        for engine in ENGINES:
+            cases.append((f"nextStep/{engine}/{width}x{height}", benchNextStep, (engine, width, height), 2000))
+            cases.append((f"lineClear/{engine}/{width}x{height}", benchLineClear, (engine, width, height), 200))
+    for engine in ENGINES:
+        cases.append((f"beamSearch/{engine}/{WIDTH}x{HEIGHT}", benchBeamSearch, (engine, WIDTH, HEIGHT), 20))
+    cases.append(("rotate", benchRotate, (), 100000))
+    cases.append(("bottomCoords", benchBottomCoords, (), 100000))
+    cases.append((f"renderGrid/{WIDTH}x{HEIGHT}", benchRenderGrid, (), 500))
+
+    results = {}
+    for name, benchmark, args, ops in cases:
+        if only is not None and only not in name:
+            continue
+        ops = max(1, int(ops * scale))
+        seconds = min(benchmark(*args, seed, ops) for _ in range(repeat))
+        results[name] = {
+            "ops": ops,
+            "seconds": seconds,
+            "us_per_op": seconds / ops * 1e6,
+        }
+
+    return results
+
+def compareResults(results, baseline, tolerance):
+    """
+        Compares the results with a baseline.
+
+        Parameters
+        ----------
+        results, baseline : dict
+            Results of runBenchmarks
+
+        tolerance : float
+            Allowed slowdown, as a fraction of the baseline time
+
+        Returns
+        -------
+        regressions : list of str
+            Names of the benchmarks slower than the baseline more than the tolerance
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result["us_per_op"] / baseline[name]["us_per_op"] - 1
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:32} {baseline[name]['us_per_op']:12.2f} {result['us_per_op']:12.2f} {change*100:+8.1f}%{'  REGRESSION' if regressed else ''}")
+
+    return regressions
+
+def parseSize(size):
+    width, height = size.lower().split("x")
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the game")
+    parser.add_argument("--sizes", default="10x20,20x40,50x100,100x200", help="comma separated sizes of the grids, as WIDTHxHEIGHT")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the workloads")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the fastest is kept")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the number of operations of each benchmark")
+    parser.add_argument("--only", default=None, help="only runs the benchmarks with this text in their name")
+    parser.add_argument("--output", default=None, help="file where the results are written as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON file of previous results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown from the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [parseSize(size) for size in args.sizes.split(",")]
+    results = runBenchmarks(sizes, args.seed, args.repeat, args.scale, args.only)
+
+    print(f"{'Benchmark':32} {'us/op':>12}")
+    for name, result in results.items():
+        print(f"{name:32} {result['us_per_op']:12.2f}")
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "benchmarks": results,
+            }, f, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+
+        print()
+        print(f"{'Benchmark':32} {'baseline':>12} {'current':>12} {'change':>9}")
+        regressions = compareResults(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} benchmarks are slower than the baseline")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+    Differential check of the engines: plays seeded games with the same inputs on Tetris, BitboardTetris and BatchTetris,
+    and stops at the first step where their cells, scores or game over differ.
+    The incremental state of the games is also compared with a recomputation from the grid at every step,
+    and the games are checked against their clones, their restored snapshots, their broadcast and their replay.
+
+    Usage: python3 src/check.py --games 50 --sizes 10x20,4x12
+"""
+import argparse
+import io
+import random
+import numpy as np
+from sim import ENGINES, ACTION_KEYS, RandomPolicy, applyAction, policySeed
+from Tetris import COLOR_CODES
+from BatchTetris import BatchTetris
+from BeamSearchPlayer import searchPlacements
+from Broadcast import DeltaEncoder, DeltaDecoder
+from Replay import ReplayRecorder, ReplayPlayer
+
+# Steps between two forks of a game, where its clone and its restored snapshot start to be checked (see checkGames)
+FORK_INTERVAL = 97
+
+class CheckError(Exception):
+    pass
+
+
+class PlacementPolicy:
+    def __init__(self, seed=None, randomness=0.1):
+        """
+            Policy that moves each block to a placement (see Tetris.enumeratePlacements), with the inputs that reach it:
+            the rotations, the moves along the x-axis and the move to the bottom.
+            The best placement for the grid is chosen (see BeamSearchPlayer.searchPlacements), or sometimes a random one,
+            so that rows are cleared and the blocks above them fall.
+
+            Parameters
+            ----------
+            seed : int or str, optional
+                Seed of the random choices
+
+            randomness : float, optional
+                Probability of choosing a random placement
+        """
+        self._rng = random.Random(seed)
+        self._randomness = randomness
+        self._inputs = []
+
+    def __call__(self, tetris):
+        block = tetris.getCurrentBlock()
+        if len(self._inputs) == 0 and block is not None and block.y == 0:
+            placements = tetris.enumeratePlacements()
+            if self._rng.random() < self._randomness:
+                rotation, x, _ = self._rng.choice(placements)
+            else:
+                _, (rotation, x, _), _ = searchPlacements(tetris, placements, 1, 1)
+
+            turns = (rotation - block.rotation) % 4
+            self._inputs = list("Q" if turns == 3 else "E" * turns)
+            self._inputs.extend("A" * (block.x - x) if x < block.x else "D" * (x - block.x))
+            self._inputs.append("S")
+            self._inputs.reverse()
+
+        return self._inputs.pop() if len(self._inputs) > 0 else "."
+
+
+class _Buffer(io.BytesIO):
+    def close(self):
+        # The replay is read after the recorder closes it
+        pass
+
+
+def _recomputeState(tetris):
+    """
+        Recomputes from the grid the state that a game updates incrementally.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game
+
+        Returns
+        -------
+        state : dict
+            Row counts, column tops, cells (see Tetris.getCells), hash (see Tetris.getHash)
+            and the row bitmasks of a BitboardTetris
+    """
+    cells, right, down, _ = tetris._zobrist_keys
+    state = {
+        "row_counts": [0] * tetris.height,
+        "column_tops": [tetris.height] * tetris.width,
+        "cells": bytearray(tetris.width * tetris.height),
+        "hash": 0,
+        "rows": [0] * tetris.height,
+    }
+
+    for y in range(tetris.height):
+        for x in range(tetris.width):
+            block = tetris.grid[y][x]
+            if block is None:
+                continue
+            i = y*tetris.width + x
+
+            state["row_counts"][y] = state["row_counts"][y] + 1
+            state["column_tops"][x] = min(state["column_tops"][x], y)
+            state["cells"][i] = COLOR_CODES[block.color]
+            state["rows"][y] = state["rows"][y] | (1 << x)
+
+            state["hash"] = state["hash"] ^ cells[i]
+            if x+1 < tetris.width and tetris.grid[y][x+1] is block:
+                state["hash"] = state["hash"] ^ right[i]
+            if y+1 < tetris.height and tetris.grid[y+1][x] is block:
+                state["hash"] = state["hash"] ^ down[i]
+
+    return state
+
+def checkState(tetris, name=None):
+    """
+        Checks the incremental state of a game against its recomputation from the grid.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game
+
+        name : str, optional
+            Name of the game in the errors, its class if None
+
+        Raises
+        ------
+        CheckError
+            If a part of the state differs
+    """
+    state = _recomputeState(tetris)
+    actual = {
+        "row_counts": list(tetris._row_counts),
+        "column_tops": list(tetris._column_tops),
+        "cells": bytearray(tetris.getCells()),
+        "hash": tetris.getHash(),
+    }
+    if hasattr(tetris, "_rows"):
+        actual["rows"] = list(tetris._rows)
+
+    for key, value in actual.items():
+        if value != state[key]:
+            raise CheckError(f"{name or tetris.__class__.__name__}: {key} differs from the grid")
+
+def _fork(games):
+    """
+        Returns a clone and a copy restored from a snapshot of each engine of a game.
+
+        Parameters
+        ----------
+        games : list of (str, Tetris)
+            The name and the game of each engine, the engines come first
+
+        Returns
+        -------
+        list of (str, Tetris)
+            The new games, to check with the engines
+    """
+    forks = []
+    for name, tetris in games[:len(ENGINES)]:
+        restored = tetris.__class__(tetris.width, tetris.height)
+        restored.restore(tetris.snapshot())
+        forks.extend([(f"{name} clone", tetris.clone()), (f"{name} restored", restored)])
+    return forks
+
+def _checkReplay(replay, ticks, cells):
+    """
+        Plays a recorded game again and checks that it goes through the same states.
+
+        Parameters
+        ----------
+        replay : bytes-like
+            The replay (see Replay.ReplayRecorder)
+
+        ticks : list of (int, int)
+            The score and the hash of the game after each tick
+
+        cells : bytes
+            The final cells of the game
+    """
+    player = ReplayPlayer(io.BytesIO(replay))
+    tetris = player.createGame()
+    replayed = []
+    player.play(tetris, lambda game: replayed.append((game.score, game.getHash())))
+
+    if replayed != ticks:
+        tick = next((i for i in range(min(len(ticks), len(replayed))) if ticks[i] != replayed[i]), min(len(ticks), len(replayed)))
+        raise CheckError(f"the replay differs from the game at tick {tick+1}")
+    if tetris.getCells().tobytes() != cells:
+        raise CheckError("the cells of the replay differ at the game over")
+
+def checkGames(seeds, width, height, max_steps=None, policy="placement", fork_interval=FORK_INTERVAL):
+    """
+        Plays a game for each seed on every engine, with the same pieces and inputs, and checks that they stay identical.
+        The inputs of a game only depend on its seed (see sim.policySeed) and are chosen on the list engine.
+
+        Besides the engines, every fork_interval steps a clone and a copy restored from a snapshot of each engine
+        start receiving the same inputs, and they are checked as the engines.
+        The list engine is also broadcast (see Broadcast.DeltaEncoder), the decoded state is checked at every step,
+        and recorded (see Replay.ReplayRecorder), the replay is checked when the game is over.
+        The cells are also compared at the game over, and must not change with the inputs that follow it.
+
+        Parameters
+        ----------
+        seeds : list of int
+            Seeds of the games
+
+        width, height : int
+            Size of the grids
+
+        max_steps : int, optional
+            Maximum number of steps of each game
+
+        policy : str, optional
+            "placement" (see PlacementPolicy) or "random" (random inputs)
+
+        fork_interval : int, optional
+            Steps between two forks of each game
+
+        Returns
+        -------
+        stats : dict
+            Number of games, steps and lines checked
+
+        Raises
+        ------
+        CheckError
+            At the first difference, with the seed and the step
+    """
+    games = [[(name, engine(width, height, seed=seed)) for name, engine in ENGINES.items()] for seed in seeds]
+    forks = [[] for seed in seeds]
+    if policy == "placement":
+        policies = [PlacementPolicy(policySeed(seed)) for seed in seeds]
+    else:
+        policies = [RandomPolicy(policySeed(seed)) for seed in seeds]
+    batch = BatchTetris(width, height, seeds)
+
+    encoders = [DeltaEncoder(engines[0][1]) for engines in games]
+    decoders = [DeltaDecoder() for seed in seeds]
+    replays = [_Buffer() for seed in seeds]
+    recorders = [ReplayRecorder(replays[i], width, height, seed) for i, seed in enumerate(seeds)]
+    ticks = [[] for seed in seeds]
+
+    playing = list(range(len(seeds)))
+    stats = { "games": len(seeds), "steps": 0, "lines": 0 }
+
+    step = 0
+    while len(playing) > 0 and (max_steps is None or step < max_steps):
+        inputs = np.full(len(seeds), ".")
+        for i in playing:
+            inputs[i] = policies[i](games[i][0][1])
+            recorders[i].action(inputs[i])
+            for _, tetris in games[i] + forks[i]:
+                applyAction(tetris, inputs[i])
+        batch.moveLeft(inputs == "A")
+        batch.moveRight(inputs == "D")
+        batch.moveDown(inputs == "S")
+        batch.rotate(False, inputs == "Q")
+        batch.rotate(True, inputs == "E")
+
+        running = batch.nextStep()
+        boards = batch.getBoards()
+        step = step + 1
+        for i in list(playing):
+            try:
+                checked = games[i] + forks[i]
+                alive = [tetris.nextStep() for _, tetris in checked] + [bool(running[i])]
+                scores = [tetris.score for _, tetris in checked] + [int(batch.score[i])]
+                if len(set(alive)) > 1:
+                    raise CheckError(f"game over differs: {alive}")
+                if len(set(scores)) > 1:
+                    raise CheckError(f"scores differ: {scores}")
+
+                tetris = games[i][0][1]
+                recorders[i].tick()
+                ticks[i].append((tetris.score, tetris.getHash()))
+
+                cells = [tetris.getCells().tobytes() for _, tetris in checked] + [boards[i].tobytes()]
+                if len(set(cells)) > 1:
+                    raise CheckError("cells differ")
+                for name, tetris in checked:
+                    checkState(tetris, name)
+
+                if not alive[0]:
+                    for _, game in checked:
+                        for action in ACTION_KEYS:
+                            applyAction(game, action)
+                        if game.nextStep():
+                            raise CheckError("the game goes on after the game over")
+                        if game.getCells().tobytes() != cells[0]:
+                            raise CheckError("the cells change after the game over")
+                    recorders[i].close()
+                    _checkReplay(replays[i].getvalue(), ticks[i], tetris.getCells().tobytes())
+                    playing.remove(i)
+                    stats["steps"] = stats["steps"] + step
+                    stats["lines"] = stats["lines"] + scores[0]
+                    continue
+
+                message, _ = encoders[i].encode()
+                if message is not None:
+                    decoders[i].apply(message)
+                if decoders[i].getCells() != cells[0] or decoders[i].score != scores[0]:
+                    raise CheckError("the broadcast differs from the game")
+
+                if step % fork_interval == 0:
+                    forks[i] = _fork(games[i])
+            except CheckError as error:
+                raise CheckError(f"seed {seeds[i]}, {width}x{height}, step {step}: {error}") from None
+
+    for i in playing:
+        tetris = games[i][0][1]
+        recorders[i].close()
+        try:
+            _checkReplay(replays[i].getvalue(), ticks[i], tetris.getCells().tobytes())
+        except CheckError as error:
+            raise CheckError(f"seed {seeds[i]}, {width}x{height}, step {step}: {error}") from None
+        stats["steps"] = stats["steps"] + step
+        stats["lines"] = stats["lines"] + tetris.score
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the engines of Tetris play identical games")
+    parser.add_argument("--games", type=int, default=50, help="number of games of each size")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--sizes", default="10x20,6x16,4x12", help="comma separated sizes of the grids, as WIDTHxHEIGHT")
+    parser.add_argument("--policy", choices=["placement", "random"], default="placement", help="how inputs are chosen")
+    parser.add_argument("--max-steps", type=int, default=2000, help="maximum number of steps of each game")
+    args = parser.parse_args()
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    for size in args.sizes.split(","):
+        width, height = map(int, size.split("x"))
+        stats = checkGames(seeds, width, height, args.max_steps, args.policy)
+        print(f"{width}x{height}: {stats['games']} games, {stats['steps']} steps, {stats['lines']} lines: ok", flush=True)
+
+if __name__ == "__main__":
+    main()
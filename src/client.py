@@ -0,0 +1,277 @@
+"""
+    Stand-in clients of server.py: many connections that play with random inputs, to test and load the server,
+    and spectators that watch their games.
+
+    Usage: python3 src/client.py --clients 1000 --spectators 1000 --duration 30
+"""
+import argparse
+import asyncio
+import random
+from settings import SERVER_HOST, SERVER_PORT, SERVER_SPECTATOR_PORT
+from sim import ACTION_KEYS
+from GameServer import HELLO, STATE, WATCH, MSG_HELLO, MSG_STATE
+from Broadcast import LENGTH
+from Profiler import Profiler
+
+class _ClientProtocol(asyncio.Protocol):
+    def __init__(self, clients):
+        """
+            Connection of a stand-in client, it reads the messages of the server (see GameServer).
+        """
+        self._clients = clients
+        self._buffer = bytearray()
+        self._cells_size = None
+        self.transport = None
+        self.sent_at = None  # Time of the first input without a state in response
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._clients.connected.add(self)
+
+    def data_received(self, data):
+        clients = self._clients
+        clients.bytes = clients.bytes + len(data)
+        buffer = self._buffer
+        buffer.extend(data)
+
+        start = 0
+        while start < len(buffer):
+            kind = buffer[start]
+            if kind == MSG_HELLO:
+                if len(buffer) - start < HELLO.size:
+                    break
+                _, width, height, _, id = HELLO.unpack_from(buffer, start)
+                self._cells_size = width * height
+                clients.sessions.append(id)
+                start = start + HELLO.size
+            elif kind == MSG_STATE:
+                if len(buffer) - start < STATE.size + self._cells_size:
+                    break
+                start = start + STATE.size + self._cells_size
+                clients.states = clients.states + 1
+                if self.sent_at is not None:
+                    clients.profiler.record("latency", self.sent_at)
+                    self.sent_at = None
+            else:
+                if len(buffer) - start < STATE.size:
+                    break
+                start = start + STATE.size
+                clients.games_over = clients.games_over + 1
+        del buffer[:start]
+
+    def connection_lost(self, exc):
+        self._clients.connected.discard(self)
+        self._clients.lost.append(self)
+
+
+class _SpectatorProtocol(asyncio.Protocol):
+    def __init__(self, clients, id):
+        """
+            Connection of a stand-in spectator, it counts the messages of the game (see Broadcast).
+        """
+        self._clients = clients
+        self._id = id
+        self._buffer = bytearray()
+
+    def connection_made(self, transport):
+        transport.write(WATCH.pack(self._id))
+
+    def data_received(self, data):
+        clients = self._clients
+        clients.spectator_bytes = clients.spectator_bytes + len(data)
+        buffer = self._buffer
+        buffer.extend(data)
+
+        start = 0
+        while len(buffer) - start >= LENGTH.size:
+            size, = LENGTH.unpack_from(buffer, start)
+            if len(buffer) - start < LENGTH.size + size:
+                break
+            start = start + LENGTH.size + size
+            clients.spectator_messages = clients.spectator_messages + 1
+        del buffer[:start]
+
+
+class StandInClients:
+    def __init__(self, host, port, rate=5, seed=None):
+        """
+            Clients that connect to a server and send random inputs.
+            The inputs of all the clients are sent by a single loop.
+
+            Parameters
+            ----------
+            host, port
+                Address of the server
+
+            rate : float, optional
+                Inputs sent per second by each client, on average
+
+            seed : int, optional
+                Seed of the inputs
+        """
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.profiler = Profiler(size=1 << 16)  # Time between an input and the next state received
+
+        self._rng = random.Random(seed)
+        self.connected = set()
+        self.lost = []
+        self.sessions = []  # Ids of the sessions of the clients
+
+        self.spectator_messages = 0
+        self.spectator_bytes = 0
+
+        self.states = 0
+        self.games_over = 0
+        self.bytes = 0
+
+    async def connect(self, count):
+        """
+            Opens new connections.
+
+            Parameters
+            ----------
+            count : int
+                Number of connections
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(count):
+            await loop.create_connection(lambda: _ClientProtocol(self), self.host, self.port)
+
+    async def watch(self, count, port):
+        """
+            Opens connections of spectators, each one watches the game of one of the clients.
+
+            Parameters
+            ----------
+            count : int
+                Number of spectators
+
+            port : int
+                Port of the spectators of the server
+        """
+        loop = asyncio.get_running_loop()
+        for i in range(count):
+            id = self.sessions[i % len(self.sessions)]
+            await loop.create_connection(lambda: _SpectatorProtocol(self, id), self.host, port)
+
+    async def run(self, duration, reconnect=True, input_rate=60):
+        """
+            Sends the inputs for some time.
+
+            Parameters
+            ----------
+            duration : float
+                Seconds
+
+            reconnect : bool, optional
+                If True, a new connection replaces each connection closed by the server, when its game is over
+
+            input_rate : int, optional
+                Times per second the inputs are sent
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        probability = self.rate / input_rate
+        while loop.time() < end:
+            for client in self.connected:
+                if self._rng.random() < probability:
+                    client.transport.write(self._rng.choice(ACTION_KEYS[1:]).encode())
+                    if client.sent_at is None:
+                        client.sent_at = self.profiler.now()
+
+            if reconnect and len(self.lost) > 0:
+                lost, self.lost = self.lost, []
+                await self.connect(len(lost))
+            await asyncio.sleep(1 / input_rate)
+
+    def close(self):
+        """
+            Closes the connections.
+        """
+        for client in list(self.connected):
+            client.transport.close()
+
+
+async def runClients(host, port, clients, duration, rate=5, seed=None, spectators=0, spectator_port=SERVER_SPECTATOR_PORT):
+    """
+        Connects stand-in clients to a server and plays for some time.
+
+        Parameters
+        ----------
+        host, port
+            Address of the server
+
+        clients : int
+            Number of connections
+
+        duration : float
+            Seconds
+
+        rate : float, optional
+            Inputs sent per second by each client
+
+        seed : int, optional
+            Seed of the inputs
+
+        spectators : int, optional
+            Number of spectators, they watch the first games of the clients
+
+        spectator_port : int, optional
+            Port of the spectators of the server
+
+        Returns
+        -------
+        stats : dict
+            Connections, states and games over received, bytes received, timings of the responses to the inputs,
+            messages and bytes received by the spectators
+    """
+    stand_in = StandInClients(host, port, rate, seed)
+    await stand_in.connect(clients)
+    await asyncio.sleep(0.1)  # Waits for the ids of the sessions
+    if spectators > 0:
+        await stand_in.watch(spectators, spectator_port)
+    await stand_in.run(duration)
+    connections = len(stand_in.connected)
+    stand_in.close()
+    await asyncio.sleep(0)
+
+    return {
+        "connections": connections,
+        "states": stand_in.states,
+        "games_over": stand_in.games_over,
+        "bytes": stand_in.bytes,
+        "timings": stand_in.profiler.summary(),
+        "spectator_messages": stand_in.spectator_messages,
+        "spectator_bytes": stand_in.spectator_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in clients of the Tetris server, playing with random inputs")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--clients", type=int, default=100, help="number of connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of play")
+    parser.add_argument("--rate", type=float, default=5, help="inputs per second of each client")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the inputs")
+    parser.add_argument("--spectators", type=int, default=0, help="number of spectators, they watch the games of the clients")
+    parser.add_argument("--spectator-port", type=int, default=SERVER_SPECTATOR_PORT)
+    args = parser.parse_args()
+
+    stats = asyncio.run(runClients(
+        args.host, args.port, args.clients, args.duration, args.rate, args.seed, args.spectators, args.spectator_port
+    ))
+
+    print(f"Connections: {stats['connections']}")
+    print(f"States:      {stats['states']}")
+    print(f"Games over:  {stats['games_over']}")
+    print(f"Received:    {stats['bytes'] / 1e6:.1f} MB")
+    latency = stats["timings"].get("latency")
+    if latency is not None:
+        print(f"Latency:     p50 {latency['p50_ms']:.2f} ms  p99 {latency['p99_ms']:.2f} ms  max {latency['max_ms']:.2f} ms")
+    if args.spectators > 0:
+        print(f"Spectators:  {stats['spectator_messages']} messages, {stats['spectator_bytes'] / args.spectators / args.duration:.0f} bytes/s each")
+
+if __name__ == "__main__":
+    main()
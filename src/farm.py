@@ -0,0 +1,126 @@
+"""
+    Plays seeded games in parallel on a pool of processes.
+
+    Usage: python3 src/farm.py --games 10000 --processes 8 --output results.jsonl
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import time
+from settings import WIDTH, HEIGHT
+from sim import ENGINES, ACTION_KEYS, playSeededGame
+from PieceGenerator import GENERATORS
+
+def runFarm(seeds, processes=None, chunksize=None, **options):
+    """
+        Plays a game for each seed on a pool of processes.
+        Each game has its own random generators, so its result only depends on its seed.
+
+        Parameters
+        ----------
+        seeds : list of int
+            Seeds of the games
+
+        processes : int, optional
+            Number of processes, by default the number of cores
+
+        chunksize : int, optional
+            Number of games sent to a process at once
+
+        options
+            Other arguments of sim.playSeededGame
+
+        Returns
+        -------
+        results : iterator of dict
+            The result of each game, in order of completion
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if chunksize is None:
+        # A few chunks for each process to balance games of different length
+        chunksize = max(1, len(seeds) // (processes * 4))
+
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(functools.partial(playSeededGame, **options), seeds, chunksize)
+
+
+class Aggregator:
+    def __init__(self):
+        """
+            Collects the results of the games.
+        """
+        self.games = 0
+        self.score = 0
+        self.lines = 0
+        self.steps = 0
+        self.best = None
+
+    def add(self, result):
+        """
+            Adds the result of a game.
+
+            Parameters
+            ----------
+            result : dict
+                The result returned by sim.playSeededGame
+        """
+        self.games = self.games + 1
+        self.score = self.score + result["score"]
+        self.lines = self.lines + result["lines"]
+        self.steps = self.steps + result["steps"]
+        # Ties are broken by seed, so the best game does not depend on the completion order
+        if self.best is None or (result["score"], -result["seed"]) > (self.best["score"], -self.best["seed"]):
+            self.best = result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays seeded games of Tetris in parallel")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--processes", type=int, default=None, help="number of processes (default: number of cores)")
+    parser.add_argument("--chunksize", type=int, default=None, help="games sent to a process at once")
+    parser.add_argument("--output", default=None, help="file where the result of each game is written as a JSON line")
+    parser.add_argument("--policy", choices=["random", "scripted"], default="random", help="how inputs are chosen")
+    parser.add_argument("--script", default="AAQ.DDDE.S", help=f"inputs of the scripted policy, made of the keys '{ACTION_KEYS}'")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="list", help="grid engine")
+    parser.add_argument("--generator", choices=GENERATORS.keys(), default="uniform", help="piece generator")
+    parser.add_argument("--sequence", default=None, help="file with a fixed sequence of pieces, replaces the generator")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--max-steps", type=int, default=None, help="maximum number of steps of each game")
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+
+    seeds = range(args.seed, args.seed + args.games)
+    aggregator = Aggregator()
+    output = open(args.output, "w") if args.output else None
+
+    start = time.perf_counter()
+    results = runFarm(
+        seeds, args.processes, args.chunksize,
+        engine=args.engine, policy=args.policy, script=args.script,
+        generator=args.generator, sequence=args.sequence,
+        width=args.width, height=args.height, max_steps=args.max_steps
+    )
+    for result in results:
+        aggregator.add(result)
+        if output is not None:
+            output.write(json.dumps(result) + "\n")
+    elapsed = time.perf_counter() - start
+
+    if output is not None:
+        output.close()
+
+    print(f"Games:     {aggregator.games}")
+    print(f"Steps:     {aggregator.steps}")
+    print(f"Lines:     {aggregator.lines}")
+    print(f"Score:     {aggregator.score}")
+    print(f"Best:      {aggregator.best['score']} (seed {aggregator.best['seed']})")
+    print(f"Time:      {elapsed:.3f} s")
+    print(f"Games/sec: {aggregator.games / elapsed:.1f}")
+    print(f"Steps/sec: {aggregator.steps / elapsed:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,95 @@
+import random
 import pygame
 from settings import *
 from Tetris import Tetris
+from sim import applyAction
+from Replay import ReplayRecorder
 from ScreenController import ScreenController
+from Scheduler import Scheduler
+from Profiler import Profiler, NullProfiler
 
-pygame.init()
+# Only the used subsystems are initialized
+pygame.display.init()
+pygame.font.init()
 pygame.display.set_caption("Tetris")
-tetris = Tetris(WIDTH, HEIGHT) # Game controller
+seed = random.randrange(1 << 63)
+tetris = Tetris(WIDTH, HEIGHT, seed=seed) # Game controller
 screenController = ScreenController(pygame)
 
+# Records the inputs and the ticks of the game, so that it can be replayed
+recorder = ReplayRecorder.create(REPLAY_OUTPUT, WIDTH, HEIGHT, seed) if REPLAY_OUTPUT is not None else None
+
+def applyInput(action):
+    """
+        Applies an input to the game and records it.
+
+        Parameters
+        ----------
+        action : str
+            One of the keys in sim.ACTION_KEYS
+    """
+    applyAction(tetris, action)
+    if recorder is not None:
+        recorder.action(action)
+
+# Records the duration of the phases of the loop and of the internals of the game
+profiling = PROFILE_OUTPUT is not None or PROFILE_TRACE_OUTPUT is not None
+profiler = Profiler() if profiling else NullProfiler()
+profiler.instrument(tetris, ["_canFall", "_insertBlock", "_removeBlock", "_resetRow", "_handleGravity"])
+
 screenController.initUI()
 
 fall_delay = FALL_DELAY_START
-fall_prev_tick = 0
 score_at_last_delay_update = 0
 
+# The game runs at its own rate, independently from the input and the rendering
+scheduler = Scheduler(fall_delay, clock=pygame.time.get_ticks)
+render_delay = 1000 / FPS
+render_prev_tick = -render_delay
+
+# Moves repeated while a key is held, with the time of the last move
+held_moves = [
+    ((pygame.K_LEFT, pygame.K_a), "A"),
+    ((pygame.K_RIGHT, pygame.K_d), "D"),
+    ((pygame.K_DOWN, pygame.K_s), "S"),
+]
+move_prev_tick = [None for _ in held_moves]
+
 clock = pygame.time.Clock()
 running = True
 
 while running:
-    clock.tick(FPS)
+    clock.tick(INPUT_RATE)
 
+    phase_start = profiler.now()
     events = pygame.event.get()
 
     keys = pygame.key.get_pressed()
-    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-        tetris.moveLeft()
-    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-        tetris.moveRight()
-    if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-        tetris.moveDown()
+    for i, (move_keys, move) in enumerate(held_moves):
+        if any(keys[key] for key in move_keys):
+            # The first move is immediate, then it is repeated
+            if move_prev_tick[i] is None or pygame.time.get_ticks() - move_prev_tick[i] >= MOVE_REPEAT_DELAY:
+                applyInput(move)
+                move_prev_tick[i] = pygame.time.get_ticks()
+        else:
+            move_prev_tick[i] = None
 
     # To prevent uncontrollable rotation
     for event in events:
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_e:
-                tetris.rotate(clockwise=True)
+                applyInput("E")
             if event.key == pygame.K_q:
-                tetris.rotate(clockwise=False)
+                applyInput("Q")
+    profiler.record("input", phase_start)
 
-    if pygame.time.get_ticks() - fall_prev_tick >= fall_delay:  # Handles game's speed
-        if not tetris.nextStep():
+    for _ in range(scheduler.update()):  # Handles game's speed
+        phase_start = profiler.now()
+        ended = not tetris.nextStep()
+        profiler.record("nextStep", phase_start)
+        if recorder is not None:
+            recorder.tick()
+        if ended:
             # Game over
             screenController.gameOver()
             # Waits an input to close the game
@@ -47,7 +97,7 @@ while running:
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT or event.type == pygame.KEYDOWN:
                         running = False
-        fall_prev_tick = pygame.time.get_ticks()
+            break
 
     for event in events:
         if event.type == pygame.QUIT:
@@ -56,10 +106,32 @@ while running:
     # Increases the speed if the threshold is reached
     if tetris.score != score_at_last_delay_update and tetris.score % FALL_DELAY_SCORE_THRESHOLD == 0:
         fall_delay = fall_delay / FALL_DELAY_DECREASE_RATE
+        scheduler.tick_delay = fall_delay
         score_at_last_delay_update = tetris.score
-        
-    screenController.renderGrid(tetris.grid)
-    screenController.updateScore(tetris.score)
-    screenController.renderNextBlock(tetris.next_block)
+
+    if running and pygame.time.get_ticks() - render_prev_tick >= render_delay:
+        phase_start = profiler.now()
+        screenController.renderGrid(tetris.grid)
+        profiler.record("renderGrid", phase_start)
+
+        phase_start = profiler.now()
+        screenController.updateScore(tetris.score)
+        profiler.record("updateScore", phase_start)
+
+        phase_start = profiler.now()
+        screenController.renderNextBlock(tetris.next_block)
+        profiler.record("renderNextBlock", phase_start)
+
+        phase_start = profiler.now()
+        screenController.updateScreen()
+        profiler.record("updateScreen", phase_start)
+        render_prev_tick = pygame.time.get_ticks()
 
 pygame.quit()
+
+if recorder is not None:
+    recorder.close()
+if PROFILE_OUTPUT is not None:
+    profiler.saveJSON(PROFILE_OUTPUT)
+if PROFILE_TRACE_OUTPUT is not None:
+    profiler.saveChromeTrace(PROFILE_TRACE_OUTPUT)
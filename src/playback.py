@@ -0,0 +1,114 @@
+"""
+    Replays a recorded game, headless as fast as possible or in real time on screen.
+
+    Usage: python3 src/playback.py game.replay [--realtime]
+"""
+import argparse
+import time
+from settings import FALL_DELAY_START, FALL_DELAY_DECREASE_RATE, FALL_DELAY_SCORE_THRESHOLD
+from sim import ENGINES, ACTION_KEYS, applyAction
+from Replay import ReplayPlayer, TICK
+
+def playHeadless(player, engine="list"):
+    """
+        Replays a game without a window, as fast as possible.
+
+        Parameters
+        ----------
+        player : ReplayPlayer
+            The replay
+
+        engine : str, optional
+            The engine to use, one of the keys of sim.ENGINES
+
+        Returns
+        -------
+        result : dict
+            Score (as displayed), lines cleared, ticks and elapsed seconds of the replay
+    """
+    tetris = player.createGame(engine)
+
+    start = time.perf_counter()
+    ticks = player.play(tetris)
+    seconds = time.perf_counter() - start
+
+    return {
+        "score": tetris.score * 100,
+        "lines": tetris.score,
+        "ticks": ticks,
+        "seconds": seconds,
+    }
+
+def playRealtime(player):
+    """
+        Replays a game on screen, with the speed of the original game.
+
+        Parameters
+        ----------
+        player : ReplayPlayer
+            The replay
+    """
+    import pygame
+    from ScreenController import ScreenController
+
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_caption("Tetris replay")
+    screenController = ScreenController(pygame)
+    screenController.initUI()
+    tetris = player.createGame()
+
+    fall_delay = FALL_DELAY_START
+    score_at_last_delay_update = 0
+
+    for action, count in player.events():
+        for _ in range(count):
+            if action != ACTION_KEYS[TICK]:
+                applyAction(tetris, action)
+                continue
+
+            if not tetris.nextStep():
+                screenController.gameOver()
+                pygame.time.wait(2000)
+                pygame.quit()
+                return
+
+            # Same speed updates of the game
+            if tetris.score != score_at_last_delay_update and tetris.score % FALL_DELAY_SCORE_THRESHOLD == 0:
+                fall_delay = fall_delay / FALL_DELAY_DECREASE_RATE
+                score_at_last_delay_update = tetris.score
+
+            screenController.renderGrid(tetris.grid)
+            screenController.updateScore(tetris.score)
+            screenController.renderNextBlock(tetris.next_block)
+            screenController.updateScreen()
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    return
+            pygame.time.wait(int(fall_delay))
+
+    pygame.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a recorded game of Tetris")
+    parser.add_argument("replay", help="file of the replay")
+    parser.add_argument("--realtime", action="store_true", help="shows the game on screen at its original speed")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="list", help="grid engine of the headless replay")
+    args = parser.parse_args()
+
+    player = ReplayPlayer.open(args.replay)
+    if args.realtime:
+        playRealtime(player)
+    else:
+        result = playHeadless(player, args.engine)
+        print(f"Score:     {result['score']}")
+        print(f"Lines:     {result['lines']}")
+        print(f"Ticks:     {result['ticks']}")
+        print(f"Time:      {result['seconds']:.3f} s")
+        print(f"Ticks/sec: {result['ticks'] / result['seconds']:.1f}")
+    player.close()
+
+if __name__ == "__main__":
+    main()
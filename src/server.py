@@ -0,0 +1,112 @@
+"""
+    Hosts games for the clients that connect over TCP, all updated by a single event loop.
+    Spectators can watch the games on another port.
+
+    Usage: python3 src/server.py --port 7777 --metrics-interval 5
+"""
+import argparse
+import asyncio
+import json
+from settings import WIDTH, HEIGHT, SERVER_HOST, SERVER_PORT, SERVER_SPECTATOR_PORT, SERVER_TICK_RATE
+from sim import ENGINES
+from GameServer import GameServer
+
+def printMetrics(metrics):
+    """
+        Prints the metrics of the server (see GameServer.getMetrics).
+    """
+    tick = metrics["timings"].get("tick")
+    if tick is None:
+        return
+    print(
+        f"sessions {metrics['sessions']:6}  spectators {metrics['spectators']:6}  ticks {metrics['ticks']:7}  late {metrics['late_ticks']:5}  "
+        f"over {metrics['games_over']:6}  tick ms p50 {tick['p50_ms']:6.2f}  p99 {tick['p99_ms']:6.2f}  max {tick['max_ms']:6.2f}",
+        flush=True
+    )
+
+async def serve(host, port, spectator_port=None, engine="list", width=WIDTH, height=HEIGHT, tick_rate=SERVER_TICK_RATE, seed=None,
+                metrics_interval=5, metrics_output=None, duration=None):
+    """
+        Runs a server and publishes its metrics periodically.
+
+        Parameters
+        ----------
+        host : str
+            Address to listen on
+
+        port : int
+            Port to listen on
+
+        spectator_port : int, optional
+            Port to listen on for the spectators, they are not accepted if None
+
+        engine : str, optional
+            The engine of the games, one of the keys of sim.ENGINES
+
+        width, height : int, optional
+            Size of the grids
+
+        tick_rate : int, optional
+            Ticks per second
+
+        seed : int, optional
+            Seed of the seeds of the games
+
+        metrics_interval : float, optional
+            Seconds between two publications of the metrics
+
+        metrics_output : str, optional
+            File where the metrics are written as JSON at each publication
+
+        duration : float, optional
+            Seconds after which the server stops, it runs forever if None
+    """
+    server = GameServer(width, height, ENGINES[engine], tick_rate, seed)
+    await server.start(host, port)
+    print(f"Listening on {host}:{server.getPort()}", flush=True)
+    if spectator_port is not None:
+        await server.startSpectators(host, spectator_port)
+        print(f"Spectators on {host}:{server.getPort(spectators=True)}", flush=True)
+
+    ticker = asyncio.create_task(server.run())
+    elapsed = 0
+    try:
+        while duration is None or elapsed < duration:
+            await asyncio.sleep(metrics_interval)
+            elapsed = elapsed + metrics_interval
+
+            metrics = server.getMetrics()
+            printMetrics(metrics)
+            if metrics_output is not None:
+                with open(metrics_output, "w") as f:
+                    json.dump(metrics, f, indent=4)
+    finally:
+        await server.stop()
+        await ticker
+
+def main():
+    parser = argparse.ArgumentParser(description="Hosts games of Tetris over TCP")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--spectator-port", type=int, default=SERVER_SPECTATOR_PORT, help="port of the spectators, -1 to disable them")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="list", help="grid engine")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--tick-rate", type=int, default=SERVER_TICK_RATE, help="ticks per second")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the seeds of the games")
+    parser.add_argument("--metrics-interval", type=float, default=5, help="seconds between two publications of the metrics")
+    parser.add_argument("--metrics-output", default=None, help="file where the metrics are written as JSON")
+    parser.add_argument("--duration", type=float, default=None, help="seconds after which the server stops")
+    args = parser.parse_args()
+
+    try:
+        spectator_port = args.spectator_port if args.spectator_port >= 0 else None
+        asyncio.run(serve(
+            args.host, args.port, spectator_port, args.engine, args.width, args.height, args.tick_rate, args.seed,
+            args.metrics_interval, args.metrics_output, args.duration
+        ))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,27 @@ EMPTY_COLOR = (255, 255, 255)
 
 # Game settings
 WIDTH, HEIGHT = 10, 20
-FPS = 15
+FPS = 15                # Frames rendered per second
+INPUT_RATE = 120        # Times per second the input is read
+MOVE_REPEAT_DELAY = 66  # Milliseconds between two moves while a key is held
 
 FALL_DELAY_START = 300
 FALL_DELAY_DECREASE_RATE = 1.05
 FALL_DELAY_SCORE_THRESHOLD = 1
 
+# File where the game is recorded, it can be replayed with playback.py (None to disable)
+REPLAY_OUTPUT = None
+
+# Profiling settings, the files are written when the game is closed (None to disable)
+PROFILE_OUTPUT = None        # Statistics of the timings as JSON
+PROFILE_TRACE_OUTPUT = None  # Timings in the Chrome trace format
+
+# Server settings (see server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7777
+SERVER_SPECTATOR_PORT = 7778
+SERVER_TICK_RATE = 60   # Ticks per second, the inputs of the clients are applied once per tick
+
 COLORS = [(200, 0, 0), (0, 200, 0), (0, 0, 200), (200, 200, 0), (0, 200, 200), (200, 0, 200), (192, 192, 192), (128, 128, 128)]
 
 BLOCKS = [
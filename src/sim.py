@@ -0,0 +1,266 @@
+"""
+    Headless runner that plays games without opening a window.
+
+    Usage: python3 src/sim.py --games 100 --policy random
+"""
+import argparse
+import random
+import time
+from settings import WIDTH, HEIGHT
+from Tetris import Tetris
+from BitboardTetris import BitboardTetris
+from PieceGenerator import GENERATORS, SequenceGenerator
+
+ENGINES = {
+    "list": Tetris,
+    "bitboard": BitboardTetris,
+}
+
+# Same keys used by the controls of the game, "." means no input
+ACTION_KEYS = ".ADSQE"
+
+def applyAction(tetris, action):
+    """
+        Applies an input to the game.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game
+
+        action : str
+            One of the keys in ACTION_KEYS
+    """
+    if action == "A":
+        tetris.moveLeft()
+    elif action == "D":
+        tetris.moveRight()
+    elif action == "S":
+        tetris.moveDown()
+    elif action == "Q":
+        tetris.rotate(clockwise=False)
+    elif action == "E":
+        tetris.rotate(clockwise=True)
+
+
+def policySeed(seed):
+    """
+        Returns the seed of the random inputs of a game, derived from the seed of the game.
+        The inputs must not be drawn from the same stream of the pieces, that are generated with the seed itself.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of the game
+
+        Returns
+        -------
+        str
+            Seed of the random policy, None if seed is None
+    """
+    return f"policy/{seed}" if seed is not None else None
+
+
+class RandomPolicy:
+    def __init__(self, seed=None, actions=ACTION_KEYS):
+        """
+            Policy that chooses a random input at each step.
+
+            Parameters
+            ----------
+            seed : int or str, optional
+                Seed of the random generator of the policy
+
+            actions : str, optional
+                The inputs to choose from
+        """
+        self._rng = random.Random(seed)
+        self._actions = actions
+
+    def __call__(self, tetris):
+        return self._rng.choice(self._actions)
+
+
+class ScriptedPolicy:
+    def __init__(self, script):
+        """
+            Policy that repeats a fixed sequence of inputs, one for each step.
+
+            Parameters
+            ----------
+            script : str
+                Sequence of keys in ACTION_KEYS
+        """
+        self._script = script
+        self._index = 0
+
+    def __call__(self, tetris):
+        action = self._script[self._index]
+        self._index = (self._index + 1) % len(self._script)
+        return action
+
+
+def playGame(tetris, policy, max_steps=None):
+    """
+        Plays a game until it is over, without any delay between the steps.
+
+        Parameters
+        ----------
+        tetris : Tetris
+            The game to play
+
+        policy : callable
+            Called with the game at each step, returns the input to apply
+
+        max_steps : int, optional
+            Maximum number of steps of the game
+
+        Returns
+        -------
+        steps : int
+            The number of steps played
+    """
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        applyAction(tetris, policy(tetris))
+        steps = steps + 1
+        if not tetris.nextStep():
+            break
+
+    return steps
+
+def makePolicy(policy, seed=None, script=None):
+    """
+        Creates an input policy.
+
+        Parameters
+        ----------
+        policy : str
+            "random" or "scripted"
+
+        seed : int, optional
+            Seed of the game, the random policy is seeded with policySeed(seed)
+
+        script : str, optional
+            Inputs of the scripted policy
+
+        Returns
+        -------
+        callable
+            The policy
+    """
+    if policy == "random":
+        return RandomPolicy(policySeed(seed))
+    return ScriptedPolicy(script)
+
+def playSeededGame(seed, engine="list", policy="random", script=None, generator="uniform", sequence=None,
+                   width=WIDTH, height=HEIGHT, max_steps=None):
+    """
+        Plays a game where the pieces and the random inputs only depend on the seed.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of the game
+
+        engine : str, optional
+            The engine to use, one of the keys of ENGINES
+
+        policy, script : str, optional
+            The input policy (see makePolicy)
+
+        generator : str, optional
+            The piece generator, one of the keys of PieceGenerator.GENERATORS
+
+        sequence : str, optional
+            File with a fixed sequence of pieces (see SequenceGenerator.fromFile), replaces the generator
+
+        width, height : int, optional
+            Size of the grid
+
+        max_steps : int, optional
+            Maximum number of steps of the game
+
+        Returns
+        -------
+        result : dict
+            Seed, score (as displayed), lines cleared and steps of the game
+    """
+    if sequence is not None:
+        piece_generator = SequenceGenerator.fromFile(sequence)
+    else:
+        piece_generator = GENERATORS[generator](seed)
+
+    tetris = ENGINES[engine](width, height, generator=piece_generator)
+    steps = playGame(tetris, makePolicy(policy, seed, script), max_steps)
+
+    return {
+        "seed": seed,
+        "score": tetris.score * 100,
+        "lines": tetris.score,
+        "steps": steps,
+    }
+
+def runBatch(games, seed=0, **options):
+    """
+        Plays a number of games one after the other.
+        The game i is played with the seed seed+i.
+
+        Parameters
+        ----------
+        games : int
+            Number of games to play
+
+        seed : int, optional
+            Seed of the first game
+
+        options
+            Other arguments of playSeededGame
+
+        Returns
+        -------
+        stats : dict
+            Number of games, total score, lines and steps, elapsed seconds
+    """
+    stats = { "games": games, "score": 0, "lines": 0, "steps": 0 }
+
+    start = time.perf_counter()
+    for i in range(games):
+        result = playSeededGame(seed + i, **options)
+        for key in ["score", "lines", "steps"]:
+            stats[key] = stats[key] + result[key]
+    stats["seconds"] = time.perf_counter() - start
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays games of Tetris without a window")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--policy", choices=["random", "scripted"], default="random", help="how inputs are chosen")
+    parser.add_argument("--script", default="AAQ.DDDE.S", help=f"inputs of the scripted policy, made of the keys '{ACTION_KEYS}'")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="list", help="grid engine")
+    parser.add_argument("--generator", choices=GENERATORS.keys(), default="uniform", help="piece generator")
+    parser.add_argument("--sequence", default=None, help="file with a fixed sequence of pieces, replaces the generator")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--max-steps", type=int, default=None, help="maximum number of steps of each game")
+    args = parser.parse_args()
+
+    stats = runBatch(
+        args.games, args.seed,
+        engine=args.engine, policy=args.policy, script=args.script,
+        generator=args.generator, sequence=args.sequence,
+        width=args.width, height=args.height, max_steps=args.max_steps
+    )
+
+    print(f"Games:     {stats['games']}")
+    print(f"Steps:     {stats['steps']}")
+    print(f"Lines:     {stats['lines']}")
+    print(f"Score:     {stats['score']}")
+    print(f"Time:      {stats['seconds']:.3f} s")
+    print(f"Games/sec: {stats['games'] / stats['seconds']:.1f}")
+    print(f"Steps/sec: {stats['steps'] / stats['seconds']:.1f}")
+
+if __name__ == "__main__":
+    main()